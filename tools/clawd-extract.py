@@ -4,143 +4,1121 @@ Clawd Extract - 终端版数据提取工具 + GLM AI 分析 + 速率限制 + 缓
 
 用法:
   clawd-extract.py --url URL --type TYPE [--analyze] [--prompt PROMPT]
+  clawd-extract.py --urls-file urls.txt --type TYPE > results.jsonl
 
 功能:
   - 提取页面内容
   - 提取链接
   - 提取图片
   - 自定义选择器
+  - 批量模式（并发抓取 + 进程池解析，JSONL 流式输出）
   - GLM AI 分析
   - 本地缓存
   - 速率限制
 
 环境变量:
   GLM_API_KEY - GLM API Key (从 ~/.clawd-glm/clawdbot.json 读取)
+  GLM_API_URL - GLM 接口地址（可指向 stub_server.py 做离线测试）
 """
 
 import argparse
+import asyncio
+import codecs
+import contextlib
+import fcntl
+import functools
 import json
 import sys
 import os
 import re
 import time
 import hashlib
-from urllib.request import urlopen, Request
-from urllib.parse import urlparse
+import sqlite3
+import gzip
+import zlib
+import queue
+import threading
+import multiprocessing
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from urllib import robotparser
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from html.parser import HTMLParser
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).parent))
+import html_text
+import http_client
+import rate_limit
 
 try:
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, SoupStrainer, NavigableString, CData, Tag
+    import soupsieve as sv
     import requests
 except ImportError:
     print("⚠️  需要: pip3 install beautifulsoup4 requests")
     sys.exit(1)
 
+try:
+    from soupsieve.css_match import CSSMatch
+except ImportError:
+    CSSMatch = None
+
+EXTRACT_TYPES = ['page', 'links', 'images', 'custom']
+PAGE_CHARS = 2000       # 正文截断长度（分块分析模式不截断）
+CUSTOM_CHARS = 200      # 自定义选择器每个元素的截断长度
+LINKS_LIMIT = 50        # 最多检查的 <a href> 个数
+IMAGES_LIMIT = 20       # 最多检查的 <img src> 个数
+CUSTOM_LIMIT = 20       # 每个自定义选择器最多取的元素数
+MAX_BYTES = 10 * 1024 * 1024
+READ_CHUNK = 64 * 1024
+CACHE_FILL_BYTES = 1024 * 1024    # 调用方提前停止后，为写入缓存最多再读这么多
+PAGE_SKIP_TAGS = html_text.SKIP_TAGS + ('nav', 'footer')
+
 class RateLimiter:
-    """速率限制器 - 每分钟最多3次调用"""
-    def __init__(self, max_calls=3, period=60):
-        self.max_calls = max_calls
-        self.period = period
-        self.calls = []
-        self.cache_file = Path.home() / '.clawd-glm' / 'cache' / 'api_calls.json'
-        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
-        self.load_calls()
-    
-    def load_calls(self):
-        """加载历史调用记录"""
-        if self.cache_file.exists():
-            try:
-                with open(self.cache_file) as f:
-                    self.calls = json.load(f)
-                # 清理过期记录
-                cutoff = time.time() - self.period
-                self.calls = [c for c in self.calls if c > cutoff]
-            except:
-                self.calls = []
+    """
+    速率限制器 - 跨进程共享的令牌桶
+    
+    每个模型一个命名桶：容量 burst，每 period/max_calls 秒补充一个令牌。
+    burst 默认 1，任意 period 秒内最多 max_calls 次；调大 burst 允许短时连续调用，
+    但满桶加上补充的令牌会让开头一个 period 内超出 max_calls。
+    桶状态存在 rate_limits.json，读写时加 fcntl 文件锁，多个进程共用同一份额度。
+    取令牌是预约式的：令牌不足时余额记为负数并返回需要等待的时间，
+    等待期间不占锁，多个调用方按预约顺序依次放行。
+    """
+    def __init__(self, max_calls=3, period=60, burst=None, buckets=None):
+        self.default = (max_calls, period, burst or 1)
+        self.buckets = dict(buckets or {})     # 名称 -> (max_calls, period, burst)
+        self.state_file = Path.home() / '.clawd-glm' / 'cache' / 'rate_limits.json'
+        self.lock_file = self.state_file.with_name('.rate_limits.lock')
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
     
-    def save_calls(self):
-        """保存调用记录"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.calls, f)
+    def configure(self, name, max_calls, period=60, burst=None):
+        """设置某个桶的额度：period 秒内 max_calls 次，最多攒 burst 个令牌"""
+        self.buckets[name] = (max_calls, period, burst or 1)
+    
+    @contextlib.contextmanager
+    def _locked_state(self):
+        with open(self.lock_file, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = json.loads(self.state_file.read_text())
+            except (FileNotFoundError, ValueError):
+                state = {}
+            yield state
+            tmp = self.state_file.with_name(f".{self.state_file.name}.{os.getpid()}")
+            tmp.write_text(json.dumps(state))
+            os.replace(tmp, self.state_file)
     
-    def wait_if_needed(self):
-        """如果需要，等待到可以调用"""
+    def reserve(self, name='default', tokens=1):
+        """预约 tokens 个令牌，返回需要等待的秒数（0 表示立即可用）"""
+        max_calls, period, burst = self.buckets.get(name, self.default)
         now = time.time()
-        cutoff = now - self.period
-        
-        # 清理过期记录
-        self.calls = [c for c in self.calls if c > cutoff]
-        
-        if len(self.calls) >= self.max_calls:
-            # 需要等待
-            oldest = min(self.calls)
-            wait_time = oldest + self.period - now
-            if wait_time > 0:
-                print(f"⏳ 速率限制：等待 {wait_time:.1f} 秒...")
-                time.sleep(wait_time)
-        
-        # 记录本次调用
-        self.calls.append(now)
-        self.save_calls()
+        with self._locked_state() as state:
+            bucket = state.get(name) or {'tokens': burst, 'updated': now}
+            available, wait = rate_limit.take(bucket['tokens'], now - bucket['updated'],
+                                              max_calls / period, burst, tokens)
+            state[name] = {'tokens': available, 'updated': now}
+        return wait
+    
+    def wait_if_needed(self, name='default', tokens=1):
+        """如果需要，等待到可以调用（阻塞）"""
+        wait_time = self.reserve(name, tokens)
+        if wait_time > 0:
+            print(f"⏳ 速率限制：等待 {wait_time:.1f} 秒...")
+            time.sleep(wait_time)
+    
+    async def acquire(self, name='default', tokens=1):
+        """异步取令牌：等待期间不阻塞事件循环"""
+        wait_time = await asyncio.to_thread(self.reserve, name, tokens)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+# ==================== 内容指纹 ====================
+
+FINGERPRINT_BITS = 64
+FINGERPRINT_BANDS = 4           # 分 4 段各 16 位建索引，海明距离 ≤3 时至少一段完全相同
+NEAR_DUP_BITS = 3               # 海明距离不超过这么多位视为同一内容
+SHINGLE_SIZE = 4
+TOKEN_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]|[^\W_]+')
+
+def content_fingerprint(text):
+    """
+    文本的 64 位 SimHash
+    
+    小写化后切词（中文按字），每 SHINGLE_SIZE 个词一个片段；
+    空白、标点和片段顺序的细微差别不影响结果，少量改动只翻转少数几位。
+    """
+    tokens = TOKEN_RE.findall(text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {' '.join(tokens)}
+    else:
+        shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big')
+              for s in shingles]
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if sum((h >> bit) & 1 for h in hashes) * 2 > len(hashes):
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def data_fingerprint(data, url=''):
+    """提取结果的内容指纹：去掉页面自身的 URL，镜像和带跟踪参数的地址得到相同指纹"""
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    if url:
+        text = text.replace(url, '')
+    return content_fingerprint(text)
+
+def fingerprint_bands(fingerprint):
+    width = FINGERPRINT_BITS // FINGERPRINT_BANDS
+    return [(fingerprint >> (i * width)) & ((1 << width) - 1) for i in range(FINGERPRINT_BANDS)]
 
 class CacheManager:
-    """缓存管理器"""
-    def __init__(self):
-        self.cache_dir = Path.home() / '.clawd-glm' / 'cache' / 'analysis'
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.max_age_days = 7
+    """
+    分析结果缓存 - 单个 SQLite 库，超出字节预算按 LRU 淘汰，过期条目定期清扫
+    
+    key 由内容指纹 + 类型 + 提示词生成，和 URL 无关：不同地址的相同内容共用结果，
+    内容变了的地址不会再命中旧结果。指纹按段建索引，相近内容（海明距离 ≤ near_bits）也能命中。
+    urls 表记录每个地址最近一次的指纹，地址内容变化时删掉只属于旧内容的结果。
+    分块 / 合并等已按内容哈希命名的条目不传指纹，直接用名称做 key。
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key         TEXT PRIMARY KEY,
+        url         TEXT NOT NULL,
+        data_type   TEXT NOT NULL,
+        prompt      TEXT NOT NULL,
+        fingerprint TEXT,
+        band0       INTEGER,
+        band1       INTEGER,
+        band2       INTEGER,
+        band3       INTEGER,
+        analysis    TEXT NOT NULL,
+        size        INTEGER NOT NULL,
+        created     REAL NOT NULL,
+        accessed    REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed);
+    CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created);
+    CREATE INDEX IF NOT EXISTS idx_entries_band0 ON entries(band0);
+    CREATE INDEX IF NOT EXISTS idx_entries_band1 ON entries(band1);
+    CREATE INDEX IF NOT EXISTS idx_entries_band2 ON entries(band2);
+    CREATE INDEX IF NOT EXISTS idx_entries_band3 ON entries(band3);
+    CREATE TABLE IF NOT EXISTS urls (
+        url         TEXT NOT NULL,
+        data_type   TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        updated     REAL NOT NULL,
+        PRIMARY KEY (url, data_type)
+    );
+    CREATE INDEX IF NOT EXISTS idx_urls_fingerprint ON urls(fingerprint);
+    CREATE TABLE IF NOT EXISTS counters (
+        name  TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS entries_bytes_insert AFTER INSERT ON entries BEGIN
+        UPDATE counters SET value = value + NEW.size WHERE name = 'bytes';
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_bytes_update AFTER UPDATE OF size ON entries BEGIN
+        UPDATE counters SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_bytes_delete AFTER DELETE ON entries BEGIN
+        UPDATE counters SET value = value - OLD.size WHERE name = 'bytes';
+    END;
+    """
+    COUNTERS = ('hits', 'near_hits', 'misses', 'evictions', 'expired', 'stale')
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_age_days=7, db_path=None,
+                 near_bits=NEAR_DUP_BITS):
+        self.db_path = Path(db_path or Path.home() / '.clawd-glm' / 'cache' / 'analysis.db')
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.near_bits = near_bits
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if columns and 'fingerprint' not in columns:
+            self._migrate()
+        self.conn.executescript(self.SCHEMA)
+        with self.conn:
+            # 总字节数由触发器维护；第一次打开（或旧库）时按现有条目算一次
+            self.conn.execute(
+                "INSERT OR IGNORE INTO counters(name, value) "
+                "SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries")
+        self.sweep()
     
-    def get_cache_key(self, url, data_type, prompt):
-        """生成缓存key"""
-        content = f"{url}|{data_type}|{prompt}"
+    def _migrate(self):
+        """
+        升级没有指纹列的旧库
+        
+        旧版按 URL 生成的 key 无法换算成内容指纹，这些条目删掉；
+        分块 / 合并条目本来就按内容哈希命名，key 不变，保留。
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE data_type NOT IN ('chunk', 'reduce')")
+            self.conn.execute("ALTER TABLE entries ADD COLUMN fingerprint TEXT")
+            for band in range(FINGERPRINT_BANDS):
+                self.conn.execute(f"ALTER TABLE entries ADD COLUMN band{band} INTEGER")
+    
+    def get_cache_key(self, url, data_type, prompt, fingerprint=None):
+        """生成缓存key：有指纹时按内容，否则按名称"""
+        source = url if fingerprint is None else f"{fingerprint:016x}"
+        content = f"{source}|{data_type}|{prompt}"
         return hashlib.md5(content.encode()).hexdigest()
     
-    def get(self, url, data_type, prompt):
-        """获取缓存"""
-        key = self.get_cache_key(url, data_type, prompt)
-        cache_file = self.cache_dir / f"{key}.json"
+    def _cutoff(self):
+        return time.time() - self.max_age_days * 86400
+    
+    def _bump(self, name, n=1):
+        self.conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+    
+    def _nearest(self, data_type, prompt, fingerprint):
+        """按指纹分段索引找海明距离最近的条目，返回 key 或 None"""
+        bands = fingerprint_bands(fingerprint)
+        rows = self.conn.execute(
+            "SELECT key, fingerprint FROM entries WHERE data_type = ? AND prompt = ? AND created >= ? "
+            "AND (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)",
+            (data_type, prompt, self._cutoff(), *bands))
+        best = None
+        for key, other in rows:
+            distance = bin(fingerprint ^ int(other, 16)).count('1')
+            if distance <= self.near_bits and (best is None or distance < best[0]):
+                best = (distance, key)
+        return best and best[1]
+    
+    def _remember_url(self, url, data_type, fingerprint):
+        """更新 URL → 指纹索引；内容变了就删掉只有这个地址用到的旧结果"""
+        if not url:
+            return
+        fp = f"{fingerprint:016x}"
+        row = self.conn.execute("SELECT fingerprint FROM urls WHERE url = ? AND data_type = ?",
+                                (url, data_type)).fetchone()
+        if row and row[0] == fp:
+            return
+        self.conn.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)",
+                          (url, data_type, fp, time.time()))
+        if not row:
+            return
+        shared = self.conn.execute("SELECT 1 FROM urls WHERE fingerprint = ? AND data_type = ?",
+                                   (row[0], data_type)).fetchone()
+        if not shared:
+            removed = self.conn.execute("DELETE FROM entries WHERE fingerprint = ? AND data_type = ?",
+                                        (row[0], data_type)).rowcount
+            if removed:
+                self._bump('stale', removed)
+    
+    def _lookup(self, url, data_type, prompt, fingerprint):
+        """先按 key 精确查，再按指纹找相近内容，返回 (key, (analysis, created, fingerprint) 或 None, 是否相近)"""
+        key = self.get_cache_key(url, data_type, prompt, fingerprint)
+        row = self.conn.execute(
+            "SELECT analysis, created, fingerprint FROM entries WHERE key = ?", (key,)).fetchone()
+        if row and row[1] < self._cutoff():
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bump('expired')
+            row = None
+        if not row and fingerprint is not None and self.near_bits:
+            near_key = self._nearest(data_type, prompt, fingerprint)
+            if near_key:
+                row = self.conn.execute(
+                    "SELECT analysis, created, fingerprint FROM entries WHERE key = ?",
+                    (near_key,)).fetchone()
+                return near_key, row, True
+        return key, row, False
+    
+    def get(self, url, data_type, prompt, fingerprint=None, count_miss=True):
+        """
+        获取缓存：先按 key 精确查，再按指纹找相近内容
         
-        if cache_file.exists():
+        count_miss=False 用于同一次查找的复查，不重复计未命中
+        """
+        with self.lock, self.conn:
+            key, row, near = self._lookup(url, data_type, prompt, fingerprint)
+            if not row:
+                if count_miss:
+                    self._bump('misses')
+                return None
+            self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._bump('near_hits' if near else 'hits')
+            if row[2]:
+                # 相近命中时记下所用结果的指纹，下次同样走到这条
+                self._remember_url(url, data_type, int(row[2], 16))
+        print("✅ 使用缓存结果（相近内容）" if near else "✅ 使用缓存结果")
+        return row[0]
+    
+    def link(self, url, data_type, prompt, fingerprint):
+        """
+        没经过 get 就复用了结果的地址（同批内容重复、等待进行中的相同调用）
+        也记到所用条目的指纹下，这样内容变化时不会误删别的地址还在用的结果
+        """
+        if fingerprint is None:
+            return
+        with self.lock, self.conn:
+            _, row, _ = self._lookup(url, data_type, prompt, fingerprint)
+            if row and row[2]:
+                self._remember_url(url, data_type, int(row[2], 16))
+    
+    def set(self, url, data_type, prompt, analysis, fingerprint=None):
+        """保存缓存，超出预算时淘汰最久未访问的条目"""
+        key = self.get_cache_key(url, data_type, prompt, fingerprint)
+        size = len(analysis.encode('utf-8')) + len(url) + len(prompt)
+        now = time.time()
+        if fingerprint is None:
+            fp, bands = None, [None] * FINGERPRINT_BANDS
+        else:
+            fp, bands = f"{fingerprint:016x}", fingerprint_bands(fingerprint)
+        with self.lock, self.conn:
+            if fingerprint is not None:
+                self._remember_url(url, data_type, fingerprint)
+            self.conn.execute(
+                "INSERT INTO entries (key, url, data_type, prompt, fingerprint, band0, band1, band2, band3, "
+                "analysis, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET url = excluded.url, fingerprint = excluded.fingerprint, "
+                "band0 = excluded.band0, band1 = excluded.band1, band2 = excluded.band2, "
+                "band3 = excluded.band3, analysis = excluded.analysis, size = excluded.size, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, url, data_type, prompt, fp, *bands, analysis, size, now, now))
+            self._evict()
+    
+    def _total_bytes(self):
+        row = self.conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+    
+    def _evict(self):
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._bump('evictions', len(victims))
+    
+    def sweep(self):
+        """删除过期条目，返回删除数"""
+        with self.lock, self.conn:
+            removed = self.conn.execute(
+                "DELETE FROM entries WHERE created < ?", (self._cutoff(),)).rowcount
+            if removed:
+                self._bump('expired', removed)
+            self.conn.execute("DELETE FROM urls WHERE updated < ?", (self._cutoff(),))
+        return removed
+    
+    def stats(self):
+        """条目数、占用字节和命中/未命中/淘汰/过期计数"""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_bytes()
+            urls = self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+        stats = {'entries': entries, 'urls': urls, 'bytes': size, 'max_bytes': self.max_bytes,
+                 'max_age_days': self.max_age_days}
+        stats.update({name: counters.get(name, 0) for name in self.COUNTERS})
+        hits = stats['hits'] + stats['near_hits']
+        lookups = hits + stats['misses']
+        stats['hit_rate'] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+    
+    def close(self):
+        self.conn.close()
+
+class SingleFlight:
+    """
+    相同 key 的并发调用只执行一次
+    
+    进程内：第一个调用者执行，其余线程等它的结果；
+    跨进程：执行者持有 inflight/<key>.lock 的文件锁，其他进程阻塞在锁上，
+    拿到锁后由 fn 自己先查缓存（执行者已写入）再决定是否调用。
+    执行者释放前删掉锁文件，拿到锁的一方发现文件已被删掉就重新打开再锁。
+    进行中的调用表是类属性，同一进程里的多个实例共享。
+    """
+    lock = threading.Lock()
+    calls = {}
+    
+    def __init__(self, lock_dir=None):
+        self.lock_dir = Path(lock_dir or Path.home() / '.clawd-glm' / 'cache' / 'inflight')
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.coalesced = 0
+    
+    def _lock_file(self, key, block=True):
+        """加文件锁并返回打开的文件；block=False 且锁被占用时返回 None"""
+        path = self.lock_dir / f"{key}.lock"
+        waited = False
+        while True:
+            f = open(path, 'w')
             try:
-                with open(cache_file) as f:
-                    cached = json.load(f)
-                
-                # 检查是否过期
-                cached_time = datetime.fromisoformat(cached['timestamp'])
-                if datetime.now() - cached_time < timedelta(days=self.max_age_days):
-                    print("✅ 使用缓存结果")
-                    return cached['analysis']
-            except:
-                pass
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    if not block:
+                        f.close()
+                        return None
+                    if not waited:
+                        print("⏳ 另一个进程正在做相同的分析，等待结果...")
+                        waited = True
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                # 锁住的可能是上一个持有者已经删掉的文件，那样别人能在新文件上拿到锁
+                with contextlib.suppress(FileNotFoundError):
+                    if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                        return f
+            except BaseException:
+                f.close()
+                raise
+            f.close()
+    
+    def _unlock_file(self, key, f):
+        # 先删再解锁：等在旧文件上的进程拿到锁后会发现文件已删除并重新打开
+        with contextlib.suppress(FileNotFoundError):
+            (self.lock_dir / f"{key}.lock").unlink()
+        f.close()
+    
+    @contextlib.contextmanager
+    def _file_lock(self, key):
+        f = self._lock_file(key)
+        try:
+            yield
+        finally:
+            self._unlock_file(key, f)
+    
+    def claim(self, key):
+        """
+        不等待地占下 key（进程内和跨进程），成功返回 True，之后必须调用 release
         
+        已有相同的调用在进行时返回 False，调用方稍后用 do 等它的结果。
+        """
+        with self.lock:
+            if key in self.calls:
+                return False
+            f = self._lock_file(key, block=False)
+            if f is None:
+                return False
+            self.calls[key] = {'event': threading.Event(), 'result': None, 'file': f}
+        return True
+    
+    def release(self, key, result=None):
+        """结束 claim 占下的调用，把结果交给等待的线程"""
+        with self.lock:
+            call = self.calls.pop(key)
+        call['result'] = result
+        self._unlock_file(key, call['file'])
+        call['event'].set()
+    
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'event': threading.Event(), 'result': None}
+        
+        if not leader:
+            call['event'].wait()
+            self.coalesced += 1
+            print("🔗 复用进行中的相同分析结果")
+            return call['result']
+        
+        try:
+            with self._file_lock(key):
+                call['result'] = fn()
+            return call['result']
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['event'].set()
+
+class ResponseCache:
+    """HTTP 响应缓存 - 正文按内容哈希去重压缩存储，元数据按 URL 存储"""
+    def __init__(self):
+        self.cache_dir = Path.home() / '.clawd-glm' / 'cache' / 'http'
+        self.blob_dir = self.cache_dir / 'blobs'
+        self.meta_dir = self.cache_dir / 'meta'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _meta_file(self, url):
+        return self.meta_dir / f"{hashlib.md5(url.encode()).hexdigest()}.json"
+    
+    def _blob_file(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.gz"
+    
+    def _write_atomic(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    
+    def lookup(self, url):
+        """返回 URL 的缓存元数据，没有则 None"""
+        meta_file = self._meta_file(url)
+        if not meta_file.exists():
+            return None
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if self._blob_file(meta['blob']).exists():
+                return meta
+        except:
+            pass
         return None
     
-    def set(self, url, data_type, prompt, analysis):
-        """保存缓存"""
-        key = self.get_cache_key(url, data_type, prompt)
-        cache_file = self.cache_dir / f"{key}.json"
+    def load_body(self, meta):
+        """读取缓存正文（已解码的文本）"""
+        return gzip.decompress(self._blob_file(meta['blob']).read_bytes()).decode('utf-8')
+    
+    def is_fresh(self, meta, max_age=None):
+        """是否可以不经验证直接使用：--max-age 优先，否则看 Cache-Control"""
+        age = time.time() - meta['fetched_at']
+        if max_age is not None:
+            return age < max_age
         
-        cached = {
-            'url': url,
-            'data_type': data_type,
-            'prompt': prompt,
-            'analysis': analysis,
-            'timestamp': datetime.now().isoformat()
-        }
+        directives = parse_cache_control(meta.get('cache_control'))
+        if 'no-cache' in directives:
+            return False
+        try:
+            return age < int(directives.get('max-age', 0))
+        except ValueError:
+            return False
+    
+    def validators(self, meta):
+        """条件请求头"""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+    
+    def store(self, url, body, headers):
+        """保存响应；Cache-Control: no-store 时不缓存"""
+        cache_control = headers.get('Cache-Control')
+        if 'no-store' in parse_cache_control(cache_control):
+            return
         
-        with open(cache_file, 'w') as f:
-            json.dump(cached, f, ensure_ascii=False, indent=2)
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        blob_file = self._blob_file(digest)
+        if not blob_file.exists():
+            self._write_atomic(blob_file, gzip.compress(data, compresslevel=6))
+        
+        self._write_meta(url, {
+            'url': url,
+            'blob': digest,
+            'size': len(data),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'cache_control': cache_control,
+            'fetched_at': time.time()
+        })
+    
+    def revalidated(self, url, meta, headers):
+        """304 后刷新元数据（服务器可能下发新的验证器）"""
+        meta = dict(meta)
+        meta['etag'] = headers.get('ETag') or meta.get('etag')
+        meta['last_modified'] = headers.get('Last-Modified') or meta.get('last_modified')
+        meta['cache_control'] = headers.get('Cache-Control') or meta.get('cache_control')
+        meta['fetched_at'] = time.time()
+        self._write_meta(url, meta)
+    
+    def _write_meta(self, url, meta):
+        self._write_atomic(self._meta_file(url), json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+def parse_cache_control(value):
+    """解析 Cache-Control 为 {指令: 值}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"')
+    return directives
+
+# ==================== 解析器 ====================
+
+PARSER_BACKENDS = ['auto', 'lxml', 'html.parser']
+
+# 只需要部分标签的提取器：解析时只构建这些标签，其余内容直接丢弃
+FILTER_TAGS = {'links': 'a', 'images': 'img'}
+
+def choose_parser(name='auto'):
+    """选择解析后端：auto 时有 lxml 用 lxml，否则回退到标准库"""
+    if name in ('auto', 'lxml'):
+        try:
+            import lxml  # noqa: F401
+            return 'lxml'
+        except ImportError:
+            if name == 'lxml':
+                print("⚠️  未安装 lxml（pip3 install lxml），使用 html.parser", file=sys.stderr)
+    return 'html.parser'
+
+def parse_html(html, parser='html.parser', types=None):
+    """
+    解析 HTML；types 全部是链接/图片时按标签过滤解析，
+    只物化 <a>/<img> 及其子节点
+    """
+    parse_only = None
+    if types and all(t in FILTER_TAGS for t in types):
+        parse_only = SoupStrainer([FILTER_TAGS[t] for t in types])
+    return BeautifulSoup(html, parser, parse_only=parse_only)
+
+# ==================== 提取器 ====================
+# 模块级函数，批量模式下可在进程池中运行
+
+def page_from_html(html, url, max_chars=PAGE_CHARS):
+    """流式提取正文，跳过脚本、样式、导航和页脚，够 max_chars 字符即停止（None 不限）"""
+    extractor = html_text.TextExtractor(max_chars=max_chars, separator='\n', skip_tags=PAGE_SKIP_TAGS)
+    text = extractor.extract(html)
+    
+    return [{
+        'title': extractor.title.strip(),
+        'url': url,
+        'text': text
+    }]
+
+def page_from_soup(soup, url, max_chars=PAGE_CHARS):
+    """从已解析的树提取正文（不修改树，其他提取器可继续使用）"""
+    texts = []
+    size = 0
+    for string in soup.find_all(string=True):
+        if type(string) not in (NavigableString, CData):
+            continue
+        if string.find_parent(PAGE_SKIP_TAGS):
+            continue
+        text = string.strip()
+        if not text:
+            continue
+        texts.append(text)
+        size += len(text) + 1
+        if max_chars is not None and size > max_chars:
+            break
+    
+    return [{
+        'title': soup.title.get_text().strip() if soup.title else '',
+        'url': url,
+        'text': '\n'.join(texts)[:max_chars]
+    }]
+
+def links_from_soup(soup, url):
+    links = []
+    
+    for a in soup.find_all('a', href=True)[:LINKS_LIMIT]:
+        href = a['href']
+        if href.startswith('http'):
+            links.append({
+                'text': a.get_text(strip=True)[:100] or '[图片/空]',
+                'url': href
+            })
+    
+    return links
+
+def images_from_soup(soup, url):
+    images = []
+    
+    for img in soup.find_all('img', src=True)[:IMAGES_LIMIT]:
+        src = img['src']
+        if src.startswith('http'):
+            images.append({
+                'alt': img.get('alt', '[无描述]'),
+                'src': src
+            })
+    
+    return images
+
+def custom_from_soup(soup, url, selector, max_chars=CUSTOM_CHARS):
+    """每个选择器最多 20 个元素、每个元素截断到 max_chars；max_chars=None 时都不限"""
+    limit = CUSTOM_LIMIT if max_chars is not None else None
+    
+    results = []
+    for tags in compile_selectors(selector).select(soup, limit):
+        for tag in tags:
+            results.append({
+                'tag': tag.name,
+                'text': tag.get_text(strip=True)[:max_chars]
+            })
+    
+    return results
+
+def _split_top_level(text, separators):
+    """在括号、方括号和引号之外按 separators 切分，返回 [(片段, 分隔符)]"""
+    parts, start, depth, quote = [], 0, 0, None
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif depth == 0 and ch in separators:
+            parts.append((text[start:i], ch))
+            start = i + 1
+        i += 1
+    parts.append((text[start:], None))
+    return parts
+
+def split_selectors(selector):
+    """按顶层逗号拆分选择器（:is(a, b) 和属性值里的逗号不拆）"""
+    return [part.strip() for part, _ in _split_top_level(selector, ',') if part.strip()]
+
+SIMPLE_TAG_RE = re.compile(r'^[a-zA-Z][\w-]*')
+SIMPLE_NAME_RE = re.compile(r'^[\w-]+')
+
+def _prefilter_key(sel):
+    """
+    选择器最右侧复合选择器要求的标签名 / class / id，用于遍历时快速排除元素；
+    拿不准的（伪类开头、命名空间、转义等）返回 None，对每个元素都做完整匹配
+    """
+    last = _split_top_level(sel, ' >+~')[-1][0].strip()
+    if not last or '|' in last or '\\' in last:
+        return None
+    match = SIMPLE_TAG_RE.match(last)
+    if match:
+        return ('tag', match.group().lower())
+    if last[0] in '.#':
+        match = SIMPLE_NAME_RE.match(last[1:])
+        if match:
+            return ('class' if last[0] == '.' else 'id', match.group())
+    return None
+
+class SelectorSet:
+    """一组编译好的选择器，在一次文档遍历中同时匹配"""
+    def __init__(self, selectors):
+        self.selectors = selectors
+        self.compiled = [sv.compile(sel) for sel in selectors]
+        self.by_tag = defaultdict(list)
+        self.by_class = defaultdict(list)
+        self.by_id = defaultdict(list)
+        self.generic = []
+        for index, sel in enumerate(selectors):
+            key = _prefilter_key(sel)
+            if key is None:
+                self.generic.append(index)
+            else:
+                {'tag': self.by_tag, 'class': self.by_class, 'id': self.by_id}[key[0]][key[1]].append(index)
+    
+    def _candidates(self, tag):
+        candidates = self.generic + self.by_tag.get(tag.name, [])
+        if self.by_class:
+            for cls in tag.get('class') or ():
+                candidates += self.by_class.get(cls, [])
+        if self.by_id:
+            candidates += self.by_id.get(tag.get('id'), [])
+        # class="x x" 这样重复的类名会让同一个选择器出现两次
+        return dict.fromkeys(candidates)
+    
+    def _matchers(self, soup):
+        # 一次遍历内复用同一个 CSSMatch：它缓存兄弟节点序号，:nth-child 等不会每次从头数
+        # CSSMatch 是 soupsieve 的内部类，签名变了就退回公开的 match
+        if CSSMatch is not None:
+            try:
+                return [CSSMatch(c.selectors, soup, c.namespaces, c.flags).match for c in self.compiled]
+            except (TypeError, AttributeError):
+                pass
+        return [compiled.match for compiled in self.compiled]
+    
+    def select(self, soup, limit=None):
+        """返回每个选择器匹配到的元素列表（文档顺序，每个最多 limit 个）"""
+        matchers = self._matchers(soup)
+        matches = [[] for _ in self.selectors]
+        remaining = len(self.selectors)
+        for tag in soup.descendants:
+            if not isinstance(tag, Tag):
+                continue
+            for index in self._candidates(tag):
+                bucket = matches[index]
+                if limit is not None and len(bucket) >= limit:
+                    continue
+                if matchers[index](tag):
+                    bucket.append(tag)
+                    if limit is not None and len(bucket) == limit:
+                        remaining -= 1
+            if limit is not None and remaining == 0:
+                break
+        return matches
+
+@functools.lru_cache(maxsize=256)
+def compile_selectors(selector):
+    """编译 --selector（结果按字符串缓存，批量 / 爬取时只编译一次）"""
+    return SelectorSet(split_selectors(selector))
+
+def _text_chunks(text, size=READ_CHUNK):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+class TagCollector(HTMLParser):
+    """
+    增量收集链接和图片，够数即停止（结果与 links_from_soup / images_from_soup 相同）
+    
+    前 max_links 个 <a href> 和前 max_images 个 <img src> 中，只保留 http 开头的。
+    """
+    def __init__(self, max_links=LINKS_LIMIT, max_images=IMAGES_LIMIT):
+        super().__init__(convert_charrefs=True)
+        self.max_links = max_links
+        self.max_images = max_images
+        self.links = []
+        self.images = []
+        self.seen_links = 0
+        self.seen_images = 0
+        self.done = False
+        self._anchor = None     # (href, 已完成的文本节点)
+        self._pending = []      # 当前文本节点（可能被切成几段）
+    
+    def _flush(self):
+        if self._anchor is not None and self._pending:
+            self._anchor[1].append(''.join(self._pending).strip())
+        self._pending = []
+    
+    def _close_anchor(self):
+        self._flush()
+        if self._anchor is None:
+            return
+        href, texts = self._anchor
+        self._anchor = None
+        if href.startswith('http'):
+            self.links.append({'text': ''.join(texts)[:100] or '[图片/空]', 'url': href})
+        self._check_done()
+    
+    def _check_done(self):
+        self.done = self.seen_links >= self.max_links and self._anchor is None \
+            and self.seen_images >= self.max_images
+    
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        attrs = dict(attrs)
+        if tag == 'a' and 'href' in attrs and self.seen_links < self.max_links:
+            self._close_anchor()
+            self.seen_links += 1
+            self._anchor = (attrs['href'] or '', [])
+        elif tag == 'img' and 'src' in attrs and self.seen_images < self.max_images:
+            self.seen_images += 1
+            src = attrs['src'] or ''
+            if src.startswith('http'):
+                alt = attrs.get('alt', '[无描述]')
+                self.images.append({'alt': alt if alt is not None else '', 'src': src})
+            self._check_done()
+    
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._close_anchor()
+        else:
+            self._flush()
+    
+    def handle_comment(self, data):
+        self._flush()
+    
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._pending.append(data)
+    
+    def close(self):
+        super().close()
+        self._close_anchor()
+    
+    def feed_chunks(self, chunks):
+        """逐块喂入，够数即返回 True"""
+        self._check_done()
+        for chunk in chunks:
+            if self.done:
+                return True
+            self.feed(chunk)
+        return self.done
+
+def extract_html(html, url, types, selector=None, parser='html.parser', full=False):
+    """在一份 HTML 上运行多个提取器（只解析一次），返回 {类型: 结果}；full=True 时正文不截断"""
+    if types == ['page']:
+        return {'page': page_from_html(html, url, None if full else PAGE_CHARS)}
+    
+    return extract_from_soup(parse_html(html, parser, types), url, types, selector, full)
+
+def extract_from_soup(soup, url, types, selector=None, full=False):
+    """在已解析的树上运行多个提取器，返回 {类型: 结果}"""
+    page_chars = None if full else PAGE_CHARS
+    custom_chars = None if full else CUSTOM_CHARS
+    extractors = {
+        'page': lambda: page_from_soup(soup, url, page_chars),
+        'links': lambda: links_from_soup(soup, url),
+        'images': lambda: images_from_soup(soup, url),
+        'custom': lambda: custom_from_soup(soup, url, selector, custom_chars),
+    }
+    return {t: extractors[t]() for t in types}
+
+# ==================== GLM 接口 ====================
+
+GLM_API_URL = "https://open.bigmodel.cn/api/coding/paas/v4/chat/completions"
+GLM_READ_TIMEOUT = 30
+GLM_BACKOFF = 5             # 429/5xx 重试的退避基数（秒），没有 Retry-After 时使用
+STREAM_IDLE_TIMEOUT = 60
+
+def read_sse_completion(response, out=None):
+    """读取流式（SSE）回复：每个增量立即写到 out（默认 stderr），返回拼好的全文"""
+    out = out or sys.stderr
+    response.encoding = 'utf-8'
+    parts = []
+    with contextlib.closing(response):
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                break
+            choices = json.loads(payload).get('choices') or [{}]
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                parts.append(delta)
+                out.write(delta)
+                out.flush()
+    if parts:
+        out.write('\n')
+    return ''.join(parts)
+
+# ==================== 分析打包 ====================
+
+PACK_TOKENS = 6000
+CJK_RE = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]')
+ITEM_RESULT_RE = re.compile(r'<<<RESULT (\d+)>>>\s*(.*?)\s*<<<END \1>>>', re.S)
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符约 1 字 1 token，其余约 4 字符 1 token"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+def pack_jobs(keys, texts, budget):
+    """按顺序贪心装包，每包估算 token 不超过 budget；单条超预算的自成一包"""
+    groups, group, used = [], [], 0
+    for key in keys:
+        cost = estimate_tokens(texts[key]) + 20     # 分隔符开销
+        if group and used + cost > budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(key)
+        used += cost
+    if group:
+        groups.append(group)
+    return groups
+
+def build_prompt(prompt, data):
+    """单条数据的分析请求"""
+    return f'{prompt}:\n\n{json.dumps(data, ensure_ascii=False, indent=2)}'
+
+def build_packed_prompt(prompt, entries):
+    """把多条数据拼成一个请求，每条用编号分隔符包起来，要求按同样格式逐条回复"""
+    lines = [
+        f'下面有 {len(entries)} 份独立的数据，请对每一份分别完成任务：{prompt}',
+        '每份的分析用 <<<RESULT 编号>>> 开头、<<<END 编号>>> 结尾，编号与输入一致，'
+        '不要合并或省略任何一份。',
+        ''
+    ]
+    for n, (url, text) in enumerate(entries, 1):
+        lines.append(f'<<<ITEM {n}>>> {url}')
+        lines.append(text)
+        lines.append(f'<<<END {n}>>>')
+    return '\n'.join(lines)
+
+def split_packed_response(reply, count):
+    """按分隔符拆回各条分析，返回 {编号: 文本}"""
+    parts = {}
+    for match in ITEM_RESULT_RE.finditer(reply):
+        n = int(match.group(1))
+        if 1 <= n <= count and match.group(2):
+            parts[n] = match.group(2)
+    return parts
+
+# ==================== 分块分析 ====================
+
+CHUNK_TOKENS = 3000
+SENTENCE_RE = re.compile(r'(?<=[。！？!?；;])\s*|(?<=\.)\s+')
+
+def data_to_text(data):
+    """把提取结果转为待分析的文本：正文保留段落，其他条目每条一行 JSON"""
+    if isinstance(data, dict):
+        return '\n\n'.join(f"# {t}\n{data_to_text(items)}" for t, items in data.items() if items)
+    blocks = []
+    for item in data:
+        if item.get('text') and len(item['text']) > CUSTOM_CHARS:
+            blocks.append(item['text'])
+        else:
+            blocks.append(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(blocks)
+
+def _split_long(paragraph, max_tokens):
+    """单段超长时按句子切，单句仍超长则按长度硬切"""
+    pieces, current = [], ''
+    for sentence in SENTENCE_RE.split(paragraph):
+        while estimate_tokens(sentence) > max_tokens:
+            cut = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:]
+        if current and estimate_tokens(current + sentence) > max_tokens:
+            pieces.append(current)
+            current = ''
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_chunks(text, max_tokens=CHUNK_TOKENS):
+    """
+    按段落切块，每块不超过 max_tokens
+    
+    切分点由内容决定：块达到 max_tokens 的 1/4 后，在哈希值满足条件的段落后切开，
+    而不是攒满再切。修改某一段只影响它所在的块，前后块的内容和哈希保持不变。
+    """
+    min_tokens = max_tokens // 4
+    chunks, current, size = [], [], 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        for piece in _split_long(line, max_tokens) if estimate_tokens(line) > max_tokens else [line]:
+            cost = estimate_tokens(piece)
+            if current and size + cost > max_tokens:
+                chunks.append('\n'.join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += cost
+            if size >= min_tokens and zlib.crc32(piece.encode('utf-8')) % 4 == 0:
+                chunks.append('\n'.join(current))
+                current, size = [], 0
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
 
 class ClawdExtract:
-    def __init__(self):
+    def __init__(self, max_age=None, offline=False, parser='auto', cache_bytes=64 * 1024 * 1024,
+                 rate=3, burst=None, stream=False, chunked=False,
+                 timeout=(http_client.CONNECT_TIMEOUT, http_client.READ_TIMEOUT),
+                 retries=http_client.RETRIES, max_bytes=MAX_BYTES):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         }
         self.api_key = self.load_api_key()
-        self.api_url = "https://open.bigmodel.cn/api/coding/paas/v4/chat/completions"
-        self.rate_limiter = RateLimiter(max_calls=3, period=60)
-        self.cache = CacheManager()
+        self.api_url = os.getenv('GLM_API_URL', GLM_API_URL)
+        self.model = 'glm-4-flash'
+        self.rate_limiter = RateLimiter()
+        self.rate_limiter.configure(self.model, max_calls=rate, period=60, burst=burst)
+        self.cache = CacheManager(max_bytes=cache_bytes)
+        self.flights = SingleFlight()
+        self.http_cache = ResponseCache()
+        self.max_age = max_age      # 缓存页面多少秒内直接使用（None 表示按 Cache-Control）
+        self.offline = offline      # 只用缓存，不访问网络
+        self.parser = choose_parser(parser)
+        self.stream = stream        # 流式接收 GLM 回复，边收边输出
+        self.chunked = chunked      # 分块分析：提取时不截断正文
+        self.timeout = timeout      # (连接超时, 读取超时)
+        self.retries = retries      # 连接错误 / 429 / 5xx 的重试次数
+        self.max_bytes = max_bytes  # 单个页面最多读取的字节数
     
     def load_api_key(self):
         """从配置文件加载 GLM API Key"""
@@ -160,233 +1138,972 @@ class ClawdExtract:
         """获取页面内容"""
         print(f"📡 抓取: {url}")
         try:
-            req = Request(url, headers=self.headers)
-            with urlopen(req, timeout=10) as response:
-                return response.read().decode('utf-8', errors='ignore')
+            return self.download(url)
         except Exception as e:
             print(f"❌ 抓取失败: {e}")
             return None
     
-    def extract_page(self, url):
-        """提取页面内容"""
-        html = self.fetch(url)
-        if not html:
-            return []
+    def download(self, url):
+        """下载整个页面（最多 max_bytes），失败抛异常（批量模式用）"""
+        return ''.join(self.stream_page(url))
+    
+    def stream_page(self, url):
+        """
+        逐块产出页面文本，失败抛异常；优先使用 HTTP 缓存，过期则条件请求验证
         
-        soup = BeautifulSoup(html, 'html.parser')
+        超过 max_bytes 即停止读取。只有完整读完的页面才写入缓存：
+        调用方提前停止（关闭生成器）后不再产出，继续读最多 CACHE_FILL_BYTES
+        把页面读完写入缓存，剩下的更多就放弃；触发字节上限时不缓存。
+        """
+        cached = self.http_cache.lookup(url)
+        if cached and (self.offline or self.http_cache.is_fresh(cached, self.max_age)):
+            yield from _text_chunks(self.http_cache.load_body(cached))
+            return
+        if self.offline:
+            raise LookupError("离线模式且没有缓存")
         
-        # 移除脚本和样式
-        for tag in soup(['script', 'style', 'nav', 'footer']):
-            tag.decompose()
+        headers = dict(self.headers)
+        if cached:
+            headers.update(self.http_cache.validators(cached))
         
-        return [{
-            'title': soup.title.string.strip() if soup.title else '',
-            'url': url,
-            'text': soup.get_text(separator='\n', strip=True)[:2000]
-        }]
+        response = http_client.get(url, headers=headers, timeout=self.timeout, retries=self.retries,
+                                   stream=True)
+        with contextlib.closing(response):
+            if response.status_code == 304 and cached:
+                self.http_cache.revalidated(url, cached, response.headers)
+                yield from _text_chunks(self.http_cache.load_body(cached))
+                return
+            response.raise_for_status()
+            
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+            parts = []
+            size = 0
+            fill_limit = None   # 调用方停止后为写缓存最多读到的字节数
+            try:
+                for chunk in response.iter_content(READ_CHUNK):
+                    size += len(chunk)
+                    if fill_limit is not None and size > fill_limit:
+                        return
+                    if size > self.max_bytes:
+                        chunk = chunk[:len(chunk) - (size - self.max_bytes)]
+                        print(f"⚠️  页面超过 {self.max_bytes // 1024 // 1024} MB，只读取前面部分",
+                              file=sys.stderr)
+                        yield decoder.decode(chunk, final=True)
+                        return
+                    text = decoder.decode(chunk)
+                    parts.append(text)
+                    if fill_limit is None:
+                        try:
+                            yield text
+                        except GeneratorExit:
+                            if 'no-store' in parse_cache_control(response.headers.get('Cache-Control')):
+                                return
+                            fill_limit = min(self.max_bytes, size + CACHE_FILL_BYTES)
+            except requests.RequestException:
+                # 调用方已经拿到需要的内容，补读失败只是不缓存
+                if fill_limit is None:
+                    raise
+                return
+            parts.append(decoder.decode(b'', final=True))
+            if fill_limit is None:
+                with contextlib.suppress(GeneratorExit):
+                    yield parts[-1]
+        
+        self.http_cache.store(url, ''.join(parts), response.headers)
+    
+    def _stream_into(self, url, collector):
+        """把页面逐块喂给增量解析器，解析器够数就停止下载；失败返回 False"""
+        print(f"📡 抓取: {url}")
+        try:
+            with contextlib.closing(self.stream_page(url)) as chunks:
+                if not collector.feed_chunks(chunks):
+                    collector.close()
+            return True
+        except Exception as e:
+            print(f"❌ 抓取失败: {e}")
+            return False
+    
+    def parse(self, html, types=None):
+        """解析 HTML 为 BeautifulSoup 树（types 只含链接/图片时按标签过滤）"""
+        return parse_html(html, self.parser, types)
+    
+    def extract_page(self, url):
+        """提取页面内容（边下载边提取，够 2000 字符即停止下载）"""
+        if self.chunked:
+            html = self.fetch(url)
+            return page_from_html(html, url, None) if html else []
+        
+        extractor = html_text.TextExtractor(max_chars=PAGE_CHARS, separator='\n',
+                                            skip_tags=PAGE_SKIP_TAGS)
+        if not self._stream_into(url, extractor):
+            return []
+        return [{'title': extractor.title.strip(), 'url': url, 'text': extractor.text}]
     
     def extract_links(self, url):
-        """提取所有链接"""
-        html = self.fetch(url)
-        if not html:
+        """提取链接（边下载边提取，够 50 个即停止下载）"""
+        collector = TagCollector(max_links=LINKS_LIMIT, max_images=0)
+        if not self._stream_into(url, collector):
             return []
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        links = []
-        
-        for a in soup.find_all('a', href=True)[:50]:
-            href = a['href']
-            if href.startswith('http'):
-                links.append({
-                    'text': a.get_text(strip=True)[:100] or '[图片/空]',
-                    'url': href
-                })
-        
-        return links
+        return collector.links
     
     def extract_images(self, url):
-        """提取所有图片"""
-        html = self.fetch(url)
-        if not html:
+        """提取图片（边下载边提取，够 20 个即停止下载）"""
+        collector = TagCollector(max_links=0, max_images=IMAGES_LIMIT)
+        if not self._stream_into(url, collector):
             return []
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        images = []
-        
-        for img in soup.find_all('img', src=True)[:20]:
-            src = img['src']
-            if src.startswith('http'):
-                images.append({
-                    'alt': img.get('alt', '[无描述]'),
-                    'src': src
-                })
-        
-        return images
+        return collector.images
     
     def extract_custom(self, url, selector):
         """自定义选择器提取"""
         html = self.fetch(url)
         if not html:
             return []
+        return custom_from_soup(self.parse(html), url, selector, None if self.chunked else CUSTOM_CHARS)
+    
+    def extract_many(self, url, types, selector=None):
+        """抓取一次、解析一次，在同一棵树上运行多个提取器，结果按类型返回"""
+        html = self.fetch(url)
+        if not html:
+            return {t: [] for t in types}
+        return extract_html(html, url, types, selector, self.parser, self.chunked)
+    
+    def analyze_with_glm(self, data, prompt="分析这些内容", url="", data_type=""):
+        """用 GLM 分析提取的数据"""
+        if not self.api_key:
+            print("⚠️  未配置 GLM API Key")
+            return None
+        
+        fingerprint = data_fingerprint(data, url)
+        
+        def analyze():
+            print("🤖 GLM 分析中...")
+            return self.chat(build_prompt(prompt, data))
+        
+        return self.cached_call(url, data_type, prompt, analyze, fingerprint=fingerprint)
+    
+    def cached_call(self, url, data_type, prompt, compute, checked=False, fingerprint=None):
+        """
+        先查缓存，未命中时 single-flight 执行 compute 并写缓存：
+        同一 key 同时只有一个线程 / 进程真正调用 GLM，其余等待并复用结果。
+        checked=True 表示调用方已经查过一次缓存；fingerprint 为内容指纹（见 CacheManager）。
+        """
+        if not checked:
+            cached = self.cache.get(url, data_type, prompt, fingerprint)
+            if cached:
+                return cached
+        
+        def lead():
+            # 等锁期间别的进程可能已经写入
+            cached = self.cache.get(url, data_type, prompt, fingerprint, count_miss=False)
+            if cached:
+                return cached
+            analysis = compute()
+            if analysis:
+                self.cache.set(url, data_type, prompt, analysis, fingerprint)
+            return analysis
+        
+        key = self.cache.get_cache_key(url, data_type, prompt, fingerprint)
+        analysis = self.flights.do(key, lead)
+        if analysis:
+            # 等到的可能是别的地址的结果，自己的地址也要记下
+            self.cache.link(url, data_type, prompt, fingerprint)
+        return analysis
+    
+    def analyze_many(self, jobs, prompt="分析这些内容", token_budget=PACK_TOKENS):
+        """
+        批量分析：jobs 为 [{'url', 'data_type', 'data'}]，返回与之对应的分析列表
+        
+        未命中缓存的任务按 token 预算打包，一次请求分析多条，
+        回复按分隔符拆回各条并分别缓存；没拆出来的条目单独重试一次。
+        每条任务先用 single-flight 占下 key，别的线程 / 进程正在分析的不打包，
+        最后等它们的结果。
+        """
+        if not self.api_key:
+            print("⚠️  未配置 GLM API Key")
+            return [None] * len(jobs)
+        
+        fingerprints = [data_fingerprint(job['data'], job['url']) for job in jobs]
+        results = [self.cache.get(job['url'], job['data_type'], prompt, fp)
+                   for job, fp in zip(jobs, fingerprints)]
+        # 同一批里内容相同的任务只分析第一个
+        first = {}
+        duplicates = {}
+        for i, analysis in enumerate(results):
+            if analysis:
+                continue
+            key = self.cache.get_cache_key(jobs[i]['url'], jobs[i]['data_type'], prompt,
+                                           fingerprints[i])
+            if key in first:
+                duplicates[i] = first[key]
+            else:
+                first[key] = i
+        keys = {i: key for key, i in first.items()}
         
-        soup = BeautifulSoup(html, 'html.parser')
-        results = []
+        pending, waiting = [], []
+        for i in sorted(first.values()):
+            if not self.flights.claim(keys[i]):
+                waiting.append(i)
+                continue
+            # 占下之前别的进程可能刚写入
+            results[i] = self.cache.get(jobs[i]['url'], jobs[i]['data_type'], prompt,
+                                        fingerprints[i], count_miss=False)
+            if results[i]:
+                self.flights.release(keys[i], results[i])
+            else:
+                pending.append(i)
+        texts = {i: json.dumps(jobs[i]['data'], ensure_ascii=False, separators=(',', ':'))
+                 for i in pending}
+        held = set(pending)
         
-        selectors = [s.strip() for s in selector.split(',')]
+        def analyze_one(i):
+            print("🤖 GLM 分析中...")
+            return self.chat(build_prompt(prompt, jobs[i]['data']))
         
-        for sel in selectors:
-            for tag in soup.select(sel)[:20]:
-                results.append({
-                    'tag': tag.name,
-                    'text': tag.get_text(strip=True)[:200]
-                })
+        def finish(i, analysis):
+            results[i] = analysis
+            if analysis:
+                self.cache.set(jobs[i]['url'], jobs[i]['data_type'], prompt, analysis,
+                               fingerprints[i])
+            held.discard(i)
+            self.flights.release(keys[i], analysis)
         
+        try:
+            for group in pack_jobs(pending, texts, token_budget - estimate_tokens(prompt)):
+                if len(group) == 1:
+                    finish(group[0], analyze_one(group[0]))
+                    continue
+                
+                print(f"🤖 GLM 打包分析 {len(group)} 条...")
+                reply = self.chat(build_packed_prompt(prompt, [(jobs[i]['url'], texts[i]) for i in group]))
+                parts = split_packed_response(reply or '', len(group))
+                for n, i in enumerate(group, 1):
+                    if parts.get(n):
+                        finish(i, parts[n])
+                    elif reply:
+                        print(f"⚠️  打包回复缺少第 {n} 条，单独重试")
+                        finish(i, analyze_one(i))
+                    else:
+                        finish(i, None)
+        finally:
+            for i in list(held):
+                self.flights.release(keys[i])
+        
+        for i in waiting:
+            results[i] = self.cached_call(jobs[i]['url'], jobs[i]['data_type'], prompt,
+                                          functools.partial(analyze_one, i), checked=True,
+                                          fingerprint=fingerprints[i])
+        for i, source in duplicates.items():
+            results[i] = results[source]
+            if results[i]:
+                self.cache.link(jobs[i]['url'], jobs[i]['data_type'], prompt, fingerprints[i])
         return results
     
-    def analyze_with_glm(self, data, prompt="分析这些内容", url="", data_type=""):
-        """用 GLM 分析提取的数据"""
+    def analyze_chunked(self, data, prompt="分析这些内容", url="", data_type="",
+                        chunk_tokens=CHUNK_TOKENS, workers=3):
+        """
+        分块分析长文档（map-reduce）
+        
+        文本按段落切块，各块并发分析（仍受速率限制），结果按块内容哈希缓存；
+        再用一次请求把各块的分析合并。文档只改了一段时，只有那一块和合并需要重新调用。
+        """
         if not self.api_key:
             print("⚠️  未配置 GLM API Key")
             return None
         
-        # 检查缓存
-        cached = self.cache.get(url, data_type, prompt)
-        if cached:
-            return cached
+        chunks = split_chunks(data_to_text(data), chunk_tokens)
+        if not chunks:
+            return None
+        keys = [f"chunk:{hashlib.sha256(chunk.encode('utf-8')).hexdigest()}" for chunk in chunks]
+        results = [self.cache.get(key, 'chunk', prompt) for key in keys]
+        pending = [i for i, analysis in enumerate(results) if not analysis]
+        print(f"🧩 共 {len(chunks)} 块，需分析 {len(pending)} 块")
+        
+        def analyze_chunk(i):
+            return self.cached_call(keys[i], 'chunk', prompt, lambda: self.chat(
+                f'{prompt}（以下是一篇长文档中的一段，只分析这一段）:\n\n{chunks[i]}', stream=False),
+                checked=True)
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for i, analysis in zip(pending, pool.map(analyze_chunk, pending)):
+                results[i] = analysis
+        
+        if not all(results):
+            print(f"❌ {results.count(None)} 块分析失败")
+            return None
+        if len(results) == 1:
+            return results[0]
         
-        # 速率限制
-        self.rate_limiter.wait_if_needed()
+        # 合并结果按各块分析的哈希缓存：没有块变化时不必重新合并
+        parts = '\n\n'.join(f'## 第 {n} 部分\n{analysis}' for n, analysis in enumerate(results, 1))
+        reduce_key = f"reduce:{hashlib.sha256(parts.encode('utf-8')).hexdigest()}"
         
-        print("🤖 GLM 分析中...")
+        def reduce():
+            print("🤖 GLM 合并各块分析...")
+            return self.chat(f'任务：{prompt}。下面是同一文档（{url}）各部分按顺序的分析，'
+                             f'请合并成一份完整、不重复的结果:\n\n{parts}')
         
-        # 将数据转为文本
-        data_text = json.dumps(data, ensure_ascii=False, indent=2)
+        return self.cached_call(reduce_key, 'reduce', prompt, reduce)
+    
+    def chat(self, content, system='你是数据分析助手，用简洁的中文分析提取的数据。', stream=None):
+        """调用 GLM（受速率限制，429/5xx 和网络错误会重试），返回回复文本；stream 默认跟随 --stream"""
+        stream = self.stream if stream is None else stream
+        payload = {
+            'model': self.model,
+            'messages': [
+                {
+                    'role': 'system',
+                    'content': system
+                },
+                {
+                    'role': 'user',
+                    'content': content
+                }
+            ],
+            'temperature': 0.7,
+            'stream': stream
+        }
         
-        # 最多重试3次
-        for attempt in range(3):
+        # 重试在这里做而不交给 http_client：每次重试都重新取令牌，不绕过速率限制
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait_if_needed(self.model)
+            last = attempt == self.retries
             try:
-                response = requests.post(
+                response = http_client.post(
                     self.api_url,
                     headers={
                         'Authorization': f'Bearer {self.api_key}',
                         'Content-Type': 'application/json'
                     },
-                    json={
-                        'model': 'glm-4-flash',
-                        'messages': [
-                            {
-                                'role': 'system',
-                                'content': '你是数据分析助手，用简洁的中文分析提取的数据。'
-                            },
-                            {
-                                'role': 'user',
-                                'content': f'{prompt}:\n\n{data_text}'
-                            }
-                        ],
-                        'temperature': 0.7
-                    },
-                    timeout=30
+                    json=payload,
+                    # 流式：只限制连接和两次数据之间的间隔，不限制总时长
+                    timeout=(self.timeout[0], STREAM_IDLE_TIMEOUT if stream else GLM_READ_TIMEOUT),
+                    retries=0,
+                    stream=stream
                 )
-                
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    print(f"❌ 分析失败: {e}")
+                    return None
+                time.sleep(http_client.backoff_delay(attempt, GLM_BACKOFF))
+                continue
+            except Exception as e:
+                print(f"❌ 分析失败: {e}")
+                return None
+            
+            try:
                 if response.status_code == 200:
+                    if stream:
+                        return read_sse_completion(response)
                     result = response.json()
-                    analysis = result['choices'][0]['message']['content']
-                    
-                    # 保存缓存
-                    self.cache.set(url, data_type, prompt, analysis)
-                    
-                    return analysis
-                elif response.status_code == 429:
-                    # Rate limit - 等待后重试
-                    wait_time = (attempt + 1) * 10
-                    print(f"⚠️  API 限流，等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
+                    return result['choices'][0]['message']['content']
+                
+                if response.status_code in http_client.RETRY_STATUSES and not last:
+                    delay = http_client.retry_after(response)
+                    wait = delay if delay is not None else http_client.backoff_delay(attempt, GLM_BACKOFF)
+                    print(f"⚠️  HTTP {response.status_code}，{wait:.1f} 秒后重试...", file=sys.stderr)
+                    response.close()
+                    time.sleep(wait)
                     continue
-                else:
-                    print(f"❌ API 错误: {response.status_code}")
-                    print(f"响应: {response.text}")
-                    return None
-                    
+                
+                print(f"❌ API 错误: {response.status_code}")
+                print(f"响应: {response.text}")
+                return None
             except Exception as e:
                 print(f"❌ 分析失败: {e}")
-                if attempt < 2:
-                    print("重试中...")
-                    time.sleep(5)
-                    continue
                 return None
-        
-        print("❌ 超过最大重试次数")
-        return None
     
     def save(self, data, output='json', analysis=None):
-        """保存结果"""
+        """保存结果（data 为列表，或多类型提取时的 {类型: 列表}）"""
         if output == 'json':
             result = {
                 'data': data,
-                'count': len(data),
+                'count': len(data) if isinstance(data, list)
+                         else {t: len(items) for t, items in data.items()},
                 'timestamp': datetime.now().isoformat()
             }
             if analysis:
                 result['analysis'] = analysis
             print(json.dumps(result, indent=2, ensure_ascii=False))
         elif output == 'csv':
-            if not data:
-                return
-            
-            keys = data[0].keys()
-            print(','.join(keys))
-            for item in data:
-                print(','.join(f'"{item.get(k, "")}"' for k in keys))
+            sections = data.items() if isinstance(data, dict) else [(None, data)]
+            for data_type, items in sections:
+                if not items:
+                    continue
+                if data_type:
+                    print(f"# {data_type}")
+                
+                keys = items[0].keys()
+                print(','.join(keys))
+                for item in items:
+                    print(','.join(f'"{item.get(k, "")}"' for k in keys))
             
             if analysis:
                 print(f"\n\n# GLM 分析:\n{analysis}", file=sys.stderr)
 
+def count_items(data):
+    """提取结果的总条数"""
+    if isinstance(data, dict):
+        return sum(len(items) for items in data.values())
+    return len(data)
+
+def parse_types(values):
+    """--type 支持空格或逗号分隔多个类型，去重保序"""
+    types = []
+    for value in values:
+        for t in value.split(','):
+            t = t.strip()
+            if t and t not in types:
+                types.append(t)
+    unknown = [t for t in types if t not in EXTRACT_TYPES]
+    if unknown:
+        print(f"❌ 未知提取类型: {', '.join(unknown)}（可选: {', '.join(EXTRACT_TYPES)}）")
+        sys.exit(1)
+    return types
+
+# ==================== 批量模式 ====================
+
+PARSE_WORKERS = min(4, os.cpu_count() or 1)    # 解析进程数默认值（spawn 每个进程要重新导入模块）
+
+def read_urls(source):
+    """读取 URL 列表（'-' 表示 stdin），忽略空行和 # 注释"""
+    f = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    try:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def interleave_by_host(urls):
+    """按 host 轮转排列，避免同一站点的 URL 扎堆占满全局并发"""
+    by_host = defaultdict(deque)
+    for index, url in enumerate(urls):
+        by_host[urlparse(url).netloc.lower()].append((index, url))
+    
+    ordered = []
+    hosts = deque(by_host.values())
+    while hosts:
+        bucket = hosts.popleft()
+        ordered.append(bucket.popleft())
+        if bucket:
+            hosts.append(bucket)
+    return ordered
+
+def run_batch(extractor, urls, types, selector=None, concurrency=16, per_host=4,
+              workers=None, ordered=False, out=None, analyze=False, prompt='',
+              pack_tokens=PACK_TOKENS, chunk_tokens=CHUNK_TOKENS):
+    """
+    批量提取：线程池并发抓取（全局 + 单 host 上限），进程池解析，
+    每个结果完成即写出一行 JSONL；ordered=True 时按输入顺序写出。
+    analyze=True 时待分析的结果攒够 pack_tokens 再打包成一次 GLM 请求；
+    分块模式下每个结果单独做分块分析。
+    """
+    out = out or sys.stdout
+    results = queue.Queue()
+    host_slots = {}
+    slots_lock = threading.Lock()
+    
+    def host_slot(url):
+        host = urlparse(url).netloc.lower()
+        with slots_lock:
+            if host not in host_slots:
+                host_slots[host] = threading.BoundedSemaphore(per_host)
+            return host_slots[host]
+    
+    # spawn 而不是 fork：抓取线程已在运行，fork 可能继承被占用的锁；进程数不超过 URL 数
+    workers = min(workers or 0, len(urls))
+    parse_pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) \
+        if workers else None
+    
+    def on_parsed(index, url, future):
+        try:
+            results.put((index, url, future.result(), None))
+        except Exception as e:
+            results.put((index, url, None, f"解析失败: {e}"))
+    
+    def fetch_job(index, url):
+        try:
+            with host_slot(url):
+                html = extractor.download(url)
+        except Exception as e:
+            results.put((index, url, None, f"抓取失败: {e}"))
+            return
+        
+        if parse_pool:
+            # 提交失败（进程池已损坏等）也要产出一条结果，否则主循环会一直等
+            try:
+                future = parse_pool.submit(extract_html, html, url, types, selector,
+                                           extractor.parser, extractor.chunked)
+            except Exception as e:
+                results.put((index, url, None, f"解析失败: {e}"))
+                return
+            future.add_done_callback(lambda f: on_parsed(index, url, f))
+        else:
+            try:
+                results.put((index, url, extract_html(html, url, types, selector, extractor.parser,
+                                                      extractor.chunked), None))
+            except Exception as e:
+                results.put((index, url, None, f"解析失败: {e}"))
+    
+    def write(record):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+    
+    start = time.time()
+    failed = 0
+    buffered = {}
+    next_index = 0
+    data_type = '+'.join(types)
+    to_analyze = []
+    pending_tokens = 0
+    pack_budget = pack_tokens - estimate_tokens(prompt)
+    
+    def finish(record):
+        nonlocal next_index
+        record['timestamp'] = datetime.now().isoformat()
+        if not ordered:
+            write(record)
+            return
+        buffered[record['index']] = record
+        while next_index in buffered:
+            write(buffered.pop(next_index))
+            next_index += 1
+    
+    def flush_analysis():
+        jobs = [{'url': r['url'], 'data_type': data_type, 'data': r['data']} for r in to_analyze]
+        # 分析过程的提示信息走 stderr，stdout 只留 JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            analyses = extractor.analyze_many(jobs, prompt, pack_tokens)
+        for record, analysis in zip(to_analyze, analyses):
+            if analysis:
+                record['analysis'] = analysis
+            finish(record)
+        to_analyze.clear()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as fetch_pool:
+            for index, url in interleave_by_host(urls):
+                fetch_pool.submit(fetch_job, index, url)
+            
+            for _ in range(len(urls)):
+                index, url, data, error = results.get()
+                record = {'url': url, 'index': index}
+                if error:
+                    failed += 1
+                    record['error'] = error
+                else:
+                    if len(types) == 1:
+                        data = data[types[0]]
+                    record['data'] = data
+                    record['count'] = count_items(data)
+                    if analyze and record['count'] and extractor.chunked:
+                        with contextlib.redirect_stdout(sys.stderr):
+                            analysis = extractor.analyze_chunked(data, prompt, url, data_type, chunk_tokens)
+                        if analysis:
+                            record['analysis'] = analysis
+                    elif analyze and record['count']:
+                        # 再加这一条就装不进一个包时，先把已攒的发出去
+                        cost = estimate_tokens(
+                            json.dumps(data, ensure_ascii=False, separators=(',', ':'))) + 20
+                        if to_analyze and pending_tokens + cost > pack_budget:
+                            flush_analysis()
+                            pending_tokens = 0
+                        to_analyze.append(record)
+                        pending_tokens += cost
+                        continue
+                finish(record)
+            
+            if to_analyze:
+                flush_analysis()
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+    
+    elapsed = time.time() - start
+    print(f"\n✅ 批量完成: {len(urls)} 个 URL，成功 {len(urls) - failed}，失败 {failed}，"
+          f"耗时 {elapsed:.1f}s（{len(urls) / max(elapsed, 1e-6):.1f} URL/s）", file=sys.stderr)
+
+# ==================== 爬取模式 ====================
+
+CRAWL_LINKS = 1000          # 每个页面最多收集的链接数（用于扩展 frontier）
+CRAWL_SAVE_EVERY = 20       # 每完成多少个页面保存一次 frontier
+ROBOTS_RETRY = 60.0         # robots.txt 取不到（网络错误、5xx）时跳过该 host 这么多秒，之后重新获取
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+def normalize_url(url, base=None):
+    """
+    规范化 URL 用于去重：补全相对链接，去掉 #片段、默认端口和跟踪参数，
+    scheme/host 小写，空路径补 /，查询参数排序；非 http(s) 返回 None
+    """
+    if base:
+        url = urljoin(base, url)
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if port and port != {'http': 80, 'https': 443}[scheme]:
+        host = f"{host}:{port}"
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not k.lower().startswith(TRACKING_PARAMS)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+class Frontier:
+    """待爬队列（按深度先后，广度优先）+ 已见集合，可保存到文件以便中断后续爬"""
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.queue = deque()        # (url, depth)
+        self.seen = set()
+        self.hosts = set()          # 允许爬取的 host（来自种子 URL）
+        self.pages = 0              # 已抓取的页面数
+    
+    def add(self, url, depth):
+        """加入队列；已见过或不在允许的站点内返回 False"""
+        if url in self.seen or urlsplit(url).netloc not in self.hosts:
+            return False
+        self.seen.add(url)
+        self.queue.append((url, depth))
+        return True
+    
+    def seed(self, urls):
+        for url in urls:
+            url = normalize_url(url)
+            if url:
+                self.hosts.add(urlsplit(url).netloc)
+                self.add(url, 0)
+    
+    def load(self):
+        """从文件恢复，文件不存在返回 False"""
+        if not self.path or not self.path.exists():
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+        self.queue = deque((url, depth) for url, depth in state['queue'])
+        self.seen = set(state['seen'])
+        self.hosts = set(state['hosts'])
+        self.pages = state['pages']
+        return True
+    
+    def save(self, in_flight=()):
+        """原子写入；正在抓取的 URL 放回队首，续爬时重新抓（不计入已抓页数）"""
+        if not self.path:
+            return
+        in_flight = list(in_flight)
+        state = {
+            'hosts': sorted(self.hosts),
+            'pages': self.pages - len(in_flight),
+            'queue': list(in_flight) + list(self.queue),
+            'seen': sorted(self.seen),
+            'updated': datetime.now().isoformat()
+        }
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False))
+        os.replace(tmp, self.path)
+
+def outlinks_from_soup(soup, url, limit=CRAWL_LINKS):
+    """前 limit 个 <a href>，按页面地址补全为绝对 URL，只保留 http 开头的"""
+    links = []
+    for a in soup.find_all('a', href=True, limit=limit):
+        href = urljoin(url, a['href'])
+        if href.startswith('http'):
+            links.append(href)
+    return links
+
+class HostPolicy:
+    """每个 host 的 robots.txt 规则、请求间隔和并发上限"""
+    def __init__(self, user_agent, delay=1.0, per_host=4, timeout=(5, 10)):
+        self.user_agent = user_agent
+        self.delay = delay
+        self.per_host = per_host
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.hosts = {}             # netloc -> {'robots', 'delay', 'next', 'slots', 'lock'}
+    
+    def _host(self, url):
+        parts = urlsplit(url)
+        with self.lock:
+            if parts.netloc not in self.hosts:
+                self.hosts[parts.netloc] = {'robots': None, 'expires': 0.0, 'lock': threading.Lock(),
+                                            'next': 0.0,
+                                            'slots': threading.BoundedSemaphore(self.per_host)}
+            host = self.hosts[parts.netloc]
+        # 每个 host 只取一次 robots.txt；暂时取不到的过 ROBOTS_RETRY 秒再取
+        with host['lock']:
+            if host['robots'] is None or host['expires'] <= time.monotonic():
+                robots, host['expires'] = self._fetch_robots(parts)
+                crawl_delay = robots.crawl_delay(self.user_agent)
+                rate = robots.request_rate(self.user_agent)
+                if rate:
+                    crawl_delay = max(crawl_delay or 0, rate.seconds / rate.requests)
+                host['robots'] = robots
+                host['delay'] = max(self.delay, float(crawl_delay or 0))
+        return host
+    
+    def _fetch_robots(self, parts):
+        """
+        取 robots.txt，返回 (规则, 过期时间)，规则与 RobotFileParser.read() 一致：
+        401/403 全部禁止，其他 4xx 全部允许；网络错误和 5xx 暂时全部禁止，过期后重新获取
+        """
+        robots = robotparser.RobotFileParser()
+        try:
+            response = http_client.get(f"{parts.scheme}://{parts.netloc}/robots.txt",
+                                       headers={'User-Agent': self.user_agent},
+                                       timeout=self.timeout, retries=1)
+        except Exception:
+            response = None
+        status = response.status_code if response is not None else None
+        if status == 200:
+            robots.parse(response.text.splitlines())
+        elif status in (401, 403):
+            robots.disallow_all = True
+        elif status is not None and 400 <= status < 500:
+            robots.allow_all = True
+        else:
+            robots.disallow_all = True
+            return robots, time.monotonic() + ROBOTS_RETRY
+        return robots, float('inf')
+    
+    def allowed(self, url):
+        return self._host(url)['robots'].can_fetch(self.user_agent, url)
+    
+    @contextlib.contextmanager
+    def slot(self, url):
+        """占用该 host 的一个并发名额，并按间隔预约发出时间"""
+        host = self._host(url)
+        with host['slots']:
+            with host['lock']:
+                now = time.monotonic()
+                start = max(now, host['next'])
+                host['next'] = start + host['delay']
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+def run_crawl(extractor, seeds, types, selector=None, max_depth=2, max_pages=100,
+              delay=1.0, concurrency=16, per_host=4, frontier_file=None, out=None):
+    """
+    站内爬取：从种子 URL 出发广度优先，链接规范化去重，只跟随种子所在的 host。
+    每个 host 遵守 robots.txt 和请求间隔（--crawl-delay 与 Crawl-delay 取大），
+    每个页面跑一遍提取器并写出一行 JSONL；frontier 定期保存，中断后用同一文件续爬。
+    """
+    out = out or sys.stdout
+    frontier = Frontier(frontier_file)
+    if frontier.load():
+        print(f"🔁 续爬: 已抓 {frontier.pages} 页，队列 {len(frontier.queue)} 个 URL", file=sys.stderr)
+    else:
+        frontier.seed(seeds)
+    policy = HostPolicy(extractor.headers['User-Agent'], delay, per_host, extractor.timeout)
+    
+    def crawl_one(url, depth):
+        if not policy.allowed(url):
+            return None, None, 'robots.txt 禁止'
+        try:
+            with policy.slot(url):
+                html = extractor.download(url)
+        except Exception as e:
+            return None, None, f"抓取失败: {e}"
+        try:
+            if depth >= max_depth:
+                return extract_html(html, url, types, selector, extractor.parser), [], None
+            # 还要扩展 frontier：提取和收集链接共用同一棵解析树
+            soup = parse_html(html, extractor.parser)
+            return extract_from_soup(soup, url, types, selector), outlinks_from_soup(soup, url), None
+        except Exception as e:
+            return None, None, f"解析失败: {e}"
+    
+    def write(record):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+    
+    start = time.time()
+    done = failed = skipped = 0
+    in_flight = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while frontier.queue or in_flight:
+                while frontier.queue and len(in_flight) < concurrency * 2 \
+                        and frontier.pages < max_pages:
+                    url, depth = frontier.queue.popleft()
+                    frontier.pages += 1
+                    in_flight[pool.submit(crawl_one, url, depth)] = (url, depth)
+                if not in_flight:
+                    break
+                
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    url, depth = in_flight.pop(future)
+                    data, links, error = future.result()
+                    if error == 'robots.txt 禁止':
+                        frontier.pages -= 1
+                        skipped += 1
+                        continue
+                    
+                    record = {'url': url, 'depth': depth}
+                    if error:
+                        failed += 1
+                        record['error'] = error
+                    else:
+                        if len(types) == 1:
+                            data = data[types[0]]
+                        record['data'] = data
+                        record['count'] = count_items(data)
+                        for link in links:
+                            link = normalize_url(link)
+                            if link:
+                                frontier.add(link, depth + 1)
+                    record['timestamp'] = datetime.now().isoformat()
+                    write(record)
+                    done += 1
+                    if done % CRAWL_SAVE_EVERY == 0:
+                        frontier.save(in_flight.values())
+    except KeyboardInterrupt:
+        print("\n⏸️  已中断", file=sys.stderr)
+        raise
+    finally:
+        frontier.save(in_flight.values())
+        elapsed = time.time() - start
+        print(f"\n✅ 爬取: {done} 页（失败 {failed}，robots 跳过 {skipped}），"
+              f"队列剩余 {len(frontier.queue)}，耗时 {elapsed:.1f}s"
+              f"（{done / max(elapsed, 1e-6):.1f} 页/s）", file=sys.stderr)
+        if frontier_file:
+            print(f"💾 frontier 已保存: {frontier_file}", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description='Clawd Extract - 终端版数据提取工具')
-    parser.add_argument('--url', required=True, help='目标URL')
-    parser.add_argument('--type', choices=['page', 'links', 'images', 'custom'], 
-                       default='page', help='提取类型')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--url', help='目标URL')
+    source.add_argument('--urls-file', help='批量模式：URL 列表文件（每行一个，- 表示 stdin），输出 JSONL')
+    parser.add_argument('--crawl', action='store_true',
+                       help='爬取模式：从 --url / --urls-file 出发跟随站内链接，输出 JSONL')
+    parser.add_argument('--max-depth', type=int, default=2, help='爬取模式：最大链接深度')
+    parser.add_argument('--max-pages', type=int, default=100, help='爬取模式：最多抓取页面数')
+    parser.add_argument('--crawl-delay', type=float, default=1.0,
+                       help='爬取模式：同一 host 两次请求的最小间隔（秒，robots.txt 要求更长时以其为准）')
+    parser.add_argument('--frontier', help='爬取模式：frontier 保存文件，中断后用同一文件续爬')
+    parser.add_argument('--type', nargs='+', default=['page'],
+                       help='提取类型 page/links/images/custom，可指定多个（抓取和解析只做一次）')
     parser.add_argument('--selector', help='自定义选择器（CSS）')
     parser.add_argument('--output', choices=['json', 'csv'], default='json', help='输出格式')
     parser.add_argument('--analyze', action='store_true', help='用 GLM AI 分析')
     parser.add_argument('--prompt', default='分析这些内容，总结关键点', help='分析提示词')
+    parser.add_argument('--stream', action='store_true', help='流式接收 GLM 回复，边生成边输出到 stderr')
+    parser.add_argument('--chunked', action='store_true',
+                       help='分块分析长文档：正文不截断，按段落切块并发分析后合并（按块缓存）')
+    parser.add_argument('--chunk-tokens', type=int, default=CHUNK_TOKENS, help='分块分析：每块 token 上限')
+    parser.add_argument('--pack-tokens', type=int, default=PACK_TOKENS,
+                       help='批量分析：每次 GLM 请求打包的数据 token 上限（1 条一次请求可设为 0）')
     parser.add_argument('--clear-cache', action='store_true', help='清除缓存')
+    parser.add_argument('--cache-stats', action='store_true', help='显示分析缓存统计')
+    parser.add_argument('--cache-size', type=float, default=64, help='分析缓存上限（MB），超出按 LRU 淘汰')
+    parser.add_argument('--max-age', type=float, help='缓存页面在 N 秒内直接使用，不发请求（默认按 Cache-Control，过期则条件请求验证）')
+    parser.add_argument('--offline', action='store_true', help='只使用已缓存的页面，不访问网络')
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default='auto',
+                       help='HTML 解析后端（auto: 有 lxml 用 lxml，否则 html.parser）')
+    parser.add_argument('--rate', type=int, default=3, help='GLM 每分钟调用上限（多个进程共享）')
+    parser.add_argument('--burst', type=int, help='GLM 最多可连续调用次数（默认 1；大于 1 时开头一分钟可能超出 --rate）')
+    parser.add_argument('--connect-timeout', type=float, default=http_client.CONNECT_TIMEOUT,
+                       help='连接超时（秒）')
+    parser.add_argument('--read-timeout', type=float, default=http_client.READ_TIMEOUT,
+                       help='抓取页面的读取超时（秒）')
+    parser.add_argument('--retries', type=int, default=http_client.RETRIES,
+                       help='连接错误、429、5xx 的重试次数（指数退避 + 抖动）')
+    parser.add_argument('--max-bytes', type=float, default=MAX_BYTES / 1024 / 1024,
+                       help='单个页面最多下载多少 MB')
+    parser.add_argument('--concurrency', type=int, default=16, help='批量模式：全局并发抓取数')
+    parser.add_argument('--per-host', type=int, default=4, help='批量模式：单个 host 并发上限')
+    parser.add_argument('--workers', type=int, default=PARSE_WORKERS,
+                       help=f'批量模式：解析进程数（默认 {PARSE_WORKERS}，0 表示在抓取线程中解析）')
+    parser.add_argument('--ordered', action='store_true', help='批量模式：按输入顺序输出')
     
     args = parser.parse_args()
     
     # 清除缓存
     if args.clear_cache:
-        cache_dir = Path.home() / '.clawd-glm' / 'cache' / 'analysis'
-        if cache_dir.exists():
-            import shutil
-            shutil.rmtree(cache_dir)
-            print("✅ 缓存已清除")
+        import shutil
+        cache_root = Path.home() / '.clawd-glm' / 'cache'
+        for name in ('analysis', 'http', 'inflight'):
+            cache_dir = cache_root / name
+            if cache_dir.exists():
+                shutil.rmtree(cache_dir)
+        for db_file in cache_root.glob('analysis.db*'):
+            db_file.unlink()
+        print("✅ 缓存已清除")
+        return
+    
+    if args.cache_stats:
+        cache = CacheManager(max_bytes=int(args.cache_size * 1024 * 1024))
+        stats = cache.stats()
+        cache.close()
+        print(f"📦 分析缓存: {cache.db_path}")
+        print(f"   条目: {stats['entries']}  地址: {stats['urls']}  占用: {stats['bytes'] / 1024 / 1024:.2f} / "
+              f"{stats['max_bytes'] / 1024 / 1024:.0f} MB  有效期: {stats['max_age_days']} 天")
+        print(f"   命中: {stats['hits']}  相近命中: {stats['near_hits']}  未命中: {stats['misses']}  命中率: {stats['hit_rate']:.1%}")
+        print(f"   淘汰: {stats['evictions']}  过期: {stats['expired']}  内容变化失效: {stats['stale']}")
         return
     
-    extractor = ClawdExtract()
+    if not args.url and not args.urls_file:
+        parser.error('需要 --url 或 --urls-file')
+    if args.rate <= 0:
+        parser.error('--rate 必须大于 0')
+    if args.crawl and (args.analyze or args.chunked):
+        parser.error('--crawl 不支持 --analyze / --chunked，可先爬取再用 --urls-file 批量分析')
+    
+    extractor = ClawdExtract(max_age=args.max_age, offline=args.offline, parser=args.parser,
+                             cache_bytes=int(args.cache_size * 1024 * 1024),
+                             rate=args.rate, burst=args.burst, stream=args.stream,
+                             chunked=args.chunked,
+                             timeout=(args.connect_timeout, args.read_timeout), retries=args.retries,
+                             max_bytes=int(args.max_bytes * 1024 * 1024))
+    
+    types = parse_types(args.type)
+    if 'custom' in types and not args.selector:
+        print("❌ custom 类型需要 --selector 参数")
+        sys.exit(1)
+    
+    if args.crawl:
+        seeds = [args.url] if args.url else read_urls(args.urls_file)
+        run_crawl(extractor, seeds, types, args.selector, max_depth=args.max_depth,
+                  max_pages=args.max_pages, delay=args.crawl_delay, concurrency=args.concurrency,
+                  per_host=args.per_host, frontier_file=args.frontier)
+        return
+    
+    if args.urls_file:
+        if args.output != 'json':
+            print("⚠️  批量模式只支持 JSONL 输出", file=sys.stderr)
+        run_batch(extractor, read_urls(args.urls_file), types, args.selector,
+                  concurrency=args.concurrency, per_host=args.per_host, workers=args.workers,
+                  ordered=args.ordered, analyze=args.analyze, prompt=args.prompt,
+                  pack_tokens=args.pack_tokens, chunk_tokens=args.chunk_tokens)
+        return
     
     # 提取数据
-    if args.type == 'page':
+    if len(types) > 1:
+        data = extractor.extract_many(args.url, types, args.selector)
+    elif types[0] == 'page':
         data = extractor.extract_page(args.url)
-    elif args.type == 'links':
+    elif types[0] == 'links':
         data = extractor.extract_links(args.url)
-    elif args.type == 'images':
+    elif types[0] == 'images':
         data = extractor.extract_images(args.url)
-    elif args.type == 'custom':
-        if not args.selector:
-            print("❌ custom 类型需要 --selector 参数")
-            sys.exit(1)
+    elif types[0] == 'custom':
         data = extractor.extract_custom(args.url, args.selector)
     
     # AI 分析
     analysis = None
-    if args.analyze and data:
-        analysis = extractor.analyze_with_glm(data, args.prompt, args.url, args.type)
+    if args.analyze and count_items(data):
+        if args.chunked:
+            analysis = extractor.analyze_chunked(data, args.prompt, args.url, '+'.join(types),
+                                                 args.chunk_tokens)
+        else:
+            analysis = extractor.analyze_with_glm(data, args.prompt, args.url, '+'.join(types))
     
     # 保存结果
     extractor.save(data, args.output, analysis)
     
-    print(f"\n✅ 提取完成: {len(data)} 条数据", file=sys.stderr)
+    print(f"\n✅ 提取完成: {count_items(data)} 条数据", file=sys.stderr)
     if analysis:
         print(f"✅ AI 分析完成", file=sys.stderr)
 
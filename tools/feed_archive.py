@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+RSS 条目归档 - SQLite + FTS5 全文索引
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+每次聚合后把所有评分过的条目按链接 upsert 到一个 SQLite 库，
+标题和摘要建 FTS5 索引，评分 / 分类 / 来源 / 日期建普通索引。
+查历史不用再翻 /tmp 下的 JSON 文件。
+
+用法:
+  feed_archive.py search memory --category AI前沿 --days 7 --limit 10
+  feed_archive.py search "multi agent" --sort relevance
+  feed_archive.py import /tmp/tech_news_20260219.json ...
+  feed_archive.py stats
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+import html_text
+
+ARCHIVE_PATH = os.path.expanduser("~/clawd-glm/cache/rss_archive.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id            INTEGER PRIMARY KEY,
+    link          TEXT NOT NULL UNIQUE,
+    title         TEXT NOT NULL DEFAULT '',
+    summary       TEXT NOT NULL DEFAULT '',
+    source        TEXT NOT NULL DEFAULT '',
+    category      TEXT NOT NULL DEFAULT '',
+    date          TEXT NOT NULL,
+    score         REAL NOT NULL DEFAULT 0,
+    ai_relevance  REAL NOT NULL DEFAULT 0,
+    depth         REAL NOT NULL DEFAULT 0,
+    actionability REAL NOT NULL DEFAULT 0,
+    first_seen    TEXT NOT NULL,
+    last_seen     TEXT NOT NULL,
+    data          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_score ON items(score);
+CREATE INDEX IF NOT EXISTS idx_items_category_date ON items(category, date);
+CREATE INDEX IF NOT EXISTS idx_items_source_date ON items(source, date);
+CREATE INDEX IF NOT EXISTS idx_items_date ON items(date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title, summary, content='items', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary) VALUES ('delete', old.id, old.title, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, summary ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary) VALUES ('delete', old.id, old.title, old.summary);
+    INSERT INTO items_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+END;
+"""
+
+UPSERT = """
+INSERT INTO items (link, title, summary, source, category, date, score,
+                   ai_relevance, depth, actionability, first_seen, last_seen, data)
+VALUES (:link, :title, :summary, :source, :category, :date, :score,
+        :ai_relevance, :depth, :actionability, :seen, :seen, :data)
+ON CONFLICT(link) DO UPDATE SET
+    title = excluded.title,
+    summary = excluded.summary,
+    source = excluded.source,
+    category = excluded.category,
+    score = excluded.score,
+    ai_relevance = excluded.ai_relevance,
+    depth = excluded.depth,
+    actionability = excluded.actionability,
+    last_seen = excluded.last_seen,
+    data = excluded.data
+"""
+
+def connect(path: str = ARCHIVE_PATH) -> sqlite3.Connection:
+    """打开归档库（不存在则创建）"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _item_date(item: Dict[str, Any], seen: str) -> str:
+    """条目日期：优先用 published，解析不了就用归档时间"""
+    try:
+        return parsedate_to_datetime(item["published"]).date().isoformat()
+    except (KeyError, TypeError, ValueError, IndexError):
+        return seen[:10]
+
+def _row(item: Dict[str, Any], seen: str) -> Dict[str, Any]:
+    return {
+        "link": item["link"],
+        "title": item.get("title", ""),
+        "summary": html_text.html_to_text(item.get("summary", "")),
+        "source": item.get("source", ""),
+        "category": item.get("category", ""),
+        "date": _item_date(item, seen),
+        "score": item.get("aidar_score", 0),
+        "ai_relevance": item.get("ai_relevance", 0),
+        "depth": item.get("depth", 0),
+        "actionability": item.get("actionability", 0),
+        "seen": seen,
+        "data": json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+    }
+
+def archive_items(items: Iterable[Dict[str, Any]], path: str = ARCHIVE_PATH,
+                  seen: Optional[str] = None) -> int:
+    """把评分后的条目 upsert 到归档，返回写入条数"""
+    seen = seen or datetime.now().isoformat(timespec="seconds")
+    rows = [_row(item, seen) for item in items if item.get("link")]
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executemany(UPSERT, rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+def _fts_query(text: str) -> str:
+    """把用户输入转为 FTS5 查询：每个词加引号，词之间是 AND"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+def search(query: str = "", path: str = ARCHIVE_PATH, categories: Optional[List[str]] = None,
+           sources: Optional[List[str]] = None, days: Optional[int] = None,
+           min_score: float = 0.0, limit: int = 10, sort: str = "score") -> List[Dict[str, Any]]:
+    """
+    检索归档
+
+    query 匹配标题和摘要（FTS5）；categories / sources / days / min_score 走普通索引。
+    sort: score 按评分、relevance 按 bm25 相关度、date 按日期。
+    """
+    where = ["items.score >= ?"]
+    params = [min_score]
+    if categories:
+        where.append(f"items.category IN ({','.join('?' * len(categories))})")
+        params.extend(categories)
+    if sources:
+        where.append(f"items.source IN ({','.join('?' * len(sources))})")
+        params.extend(sources)
+    if days:
+        where.append("items.date >= ?")
+        params.append((datetime.now() - timedelta(days=days)).date().isoformat())
+
+    order = {
+        "score": "items.score DESC, items.date DESC",
+        "date": "items.date DESC, items.score DESC",
+        "relevance": "bm25(items_fts) ASC" if query else "items.score DESC",
+    }[sort]
+
+    if query:
+        sql = (f"SELECT items.* FROM items_fts JOIN items ON items.id = items_fts.rowid "
+               f"WHERE items_fts MATCH ? AND {' AND '.join(where)} ORDER BY {order} LIMIT ?")
+        params = [_fts_query(query)] + params
+    else:
+        sql = f"SELECT items.* FROM items WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+    params.append(limit)
+
+    conn = connect(path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def stats(path: str = ARCHIVE_PATH) -> Dict[str, Any]:
+    conn = connect(path)
+    try:
+        total, first, last = conn.execute("SELECT COUNT(*), MIN(date), MAX(date) FROM items").fetchone()
+        by_category = conn.execute(
+            "SELECT category, COUNT(*) FROM items GROUP BY category ORDER BY 2 DESC").fetchall()
+    finally:
+        conn.close()
+    return {"total": total, "first": first, "last": last,
+            "by_category": {c or "-": n for c, n in by_category}}
+
+def load_dump(filename: str) -> List[Dict[str, Any]]:
+    """读取旧的 JSON 输出（列表，或带 items / top_items 的对象）"""
+    with open(filename, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return data.get("items") or data.get("top_items") or []
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS 条目归档查询')
+    parser.add_argument('--db', default=ARCHIVE_PATH, help='归档库路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_search = sub.add_parser('search', help='检索历史条目')
+    p_search.add_argument('query', nargs='?', default='', help='关键词（匹配标题和摘要）')
+    p_search.add_argument('--category', help='分类（逗号分隔），如 AI前沿,NLP前沿')
+    p_search.add_argument('--source', help='来源（逗号分隔）')
+    p_search.add_argument('--days', type=int, help='最近 N 天')
+    p_search.add_argument('--min-score', type=float, default=0.0, help='最低评分')
+    p_search.add_argument('--limit', type=int, default=10, help='最多返回条数')
+    p_search.add_argument('--sort', choices=['score', 'relevance', 'date'], default='score')
+    p_search.add_argument('--json', action='store_true', help='输出 JSON')
+
+    p_import = sub.add_parser('import', help='导入旧的 JSON 输出')
+    p_import.add_argument('files', nargs='+')
+
+    sub.add_parser('stats', help='归档统计')
+
+    args = parser.parse_args()
+
+    if args.command == 'search':
+        split = lambda v: [x.strip() for x in v.split(',')] if v else None
+        results = search(args.query, args.db, split(args.category), split(args.source),
+                         args.days, args.min_score, args.limit, args.sort)
+        if args.json:
+            print(json.dumps([json.loads(r['data']) for r in results], ensure_ascii=False, indent=2))
+            return
+        for i, r in enumerate(results, 1):
+            print(f"{i}. [{r['score']}] {r['title']}")
+            print(f"   📂 {r['category']} | {r['source']} | {r['date']}")
+            print(f"   🔗 {r['link']}")
+        print(f"\n✅ {len(results)} 条结果")
+    elif args.command == 'import':
+        for filename in args.files:
+            items = load_dump(filename)
+            mtime = datetime.fromtimestamp(os.path.getmtime(filename)).isoformat(timespec="seconds")
+            count = archive_items(items, args.db, seen=mtime)
+            print(f"✅ {filename}: {count} 条")
+    elif args.command == 'stats':
+        s = stats(args.db)
+        print(f"📚 共 {s['total']} 条（{s['first']} ~ {s['last']}）")
+        for category, count in s['by_category'].items():
+            print(f"   {category}: {count}")
+
+if __name__ == '__main__':
+    main()
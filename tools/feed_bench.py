@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+RSS 流水线基准测试 - 离线语料 + 本地替身服务器
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+语料来自 feed_corpus/ 中录制的 HN / arXiv / GitHub Trending 文档，
+按需复制条目放大到不同规模，并构造截断、坏字节、非 feed 等异常样本。
+文档由 stub_server 在本地提供，可注入延迟和失败，不访问外网。
+
+分阶段测量（抓取 / 解析 / 评分 / 端到端）：
+  条目/秒、端到端延迟分布、抓取字节数、各阶段内存峰值
+
+用法:
+  feed_bench.py [--runs 5] [--latency 0.05] [--fail-rate 0.1]
+                [--feeds hn_small,arxiv_huge] [--aggregator rss_aggregator]
+                [--output reports/feed_bench.json]
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+import feed_fetch
+import stub_server
+
+CORPUS_DIR = Path(__file__).parent / "feed_corpus"
+
+# 名称 -> (录制文档, 条目数, 异常类型)
+CORPUS = {
+    "hn_small": ("hn_frontpage.xml", 30, None),
+    "hn_large": ("hn_frontpage.xml", 1000, None),
+    "github_medium": ("github_trending.xml", 100, None),
+    "arxiv_medium": ("arxiv_cs_ai.xml", 300, None),
+    "arxiv_huge": ("arxiv_cs_ai.xml", 10000, None),
+    "malformed_truncated": ("arxiv_cs_ai.xml", 200, "truncate"),
+    "malformed_bad_bytes": ("hn_frontpage.xml", 50, "bad_bytes"),
+    "malformed_html": ("not_a_feed.html", 0, None),
+    "empty": (None, 0, None),
+}
+
+ITEM_RE = re.compile(rb"<item>.*?</item>\s*", re.S)
+
+def scale_document(raw: bytes, n_items: int) -> bytes:
+    """复制录制文档中的 <item> 到 n_items 条，编号保证每条不同"""
+    templates = ITEM_RE.findall(raw)
+    if not templates or n_items <= 0:
+        return raw
+    head = raw[:raw.index(templates[0])]
+    tail = raw[raw.rindex(templates[-1]) + len(templates[-1]):]
+    items = []
+    for i in range(n_items):
+        item = templates[i % len(templates)]
+        # 改写链接和标题，避免条目完全重复
+        item = re.sub(rb"(</link>|</guid>)", b"#%d\\1" % i, item)
+        item = re.sub(rb"(<title>(?:<!\[CDATA\[)?)", b"\\1[%d] " % i, item, count=1)
+        items.append(item)
+    return head + b"".join(items) + tail
+
+def build_document(name: str) -> Tuple[bytes, str]:
+    """生成一份语料文档，返回 (内容, Content-Type)"""
+    filename, n_items, fault = CORPUS[name]
+    if filename is None:
+        return b"", "application/rss+xml"
+
+    raw = (CORPUS_DIR / filename).read_bytes()
+    if filename.endswith(".html"):
+        return raw, "text/html; charset=utf-8"
+
+    body = scale_document(raw, n_items)
+    if fault == "truncate":
+        body = body[:len(body) * 2 // 3]
+    elif fault == "bad_bytes":
+        middle = len(body) // 2
+        body = body[:middle] + b"\xff\xfe\x00\x81" + body[middle:]
+    return body, "application/rss+xml; charset=utf-8"
+
+def build_corpus(names: List[str] = None) -> Dict[str, Tuple[bytes, str]]:
+    return {name: build_document(name) for name in (names or CORPUS)}
+
+# ==================== 测量 ====================
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+def measure(func, *args, rerun: bool = True):
+    """
+    执行并返回 (结果, 耗时秒, 内存峰值字节)
+
+    rerun=True 时计时和内存分两次跑，tracemalloc 的开销不计入耗时；
+    有副作用的阶段（抓取）用 rerun=False，只跑一次，在同一次运行里取峰值。
+    """
+    if not rerun:
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return result, elapsed, peak
+
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def stage_report(name: str, elapsed: float, items: int, nbytes: int, peak: int) -> Dict[str, Any]:
+    return {
+        "stage": name,
+        "seconds": round(elapsed, 4),
+        "items": items,
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+        "bytes": nbytes,
+        "peak_mb": round(peak / 1024 / 1024, 2)
+    }
+
+def bench_stages(base_url: str, names: List[str], score_item, feed_config) -> List[Dict[str, Any]]:
+    """逐阶段测量：抓取 → 解析 → 评分"""
+    stages = []
+
+    def fetch_all():
+        docs = {}
+        for name in names:
+            try:
+                docs[name] = feed_fetch.download_feed(f"{base_url}/feeds/{name}")
+            except Exception:
+                pass
+        return docs
+
+    # 抓取只跑一次：再跑一遍会重复下载，替身服务器的延迟和失败注入也会再算一次
+    fetched, elapsed, peak = measure(fetch_all, rerun=False)
+    nbytes = sum(len(raw) for raw, _ in fetched.values())
+    stages.append(stage_report("fetch", elapsed, len(fetched), nbytes, peak))
+
+    def parse_all():
+        parsed = []
+        for raw, headers in fetched.values():
+            parsed.extend(feed_fetch.parse_feed(raw, headers, limit=None))
+        return parsed
+
+    parsed, elapsed, peak = measure(parse_all)
+    stages.append(stage_report("parse", elapsed, len(parsed), nbytes, peak))
+
+    def score_all():
+        return [score_item(item, feed_config) for item in parsed]
+
+    scored, elapsed, peak = measure(score_all)
+    stages.append(stage_report("score", elapsed, len(scored), 0, peak))
+    return stages
+
+def bench_end_to_end(base_url: str, names: List[str], aggregator, runs: int,
+                     deadline: float) -> Dict[str, Any]:
+    """端到端：用 aggregate_all 跑 runs 次，统计延迟分布（临时替换聚合器的源列表，结束后恢复）"""
+    feeds = aggregator.RSS_FEEDS
+    aggregator.RSS_FEEDS = {
+        name: {"url": f"{base_url}/feeds/{name}", "category": "基准测试", "weight": 1.0}
+        for name in names
+    }
+    latencies = []
+    items = 0
+    missing = 0
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result, missing_feeds = aggregator.aggregate_all(deadline=deadline)
+            latencies.append(time.perf_counter() - start)
+            items += len(result)
+            missing += len(missing_feeds)
+
+        # 内存峰值单独跑一次，tracemalloc 的开销不计入延迟
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            aggregator.aggregate_all(deadline=deadline)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        aggregator.RSS_FEEDS = feeds
+
+    total = sum(latencies)
+    return {
+        "stage": "end_to_end",
+        "runs": runs,
+        "items_per_sec": round(items / total, 1) if total else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 4),
+        "latency_p90": round(percentile(latencies, 90), 4),
+        "latency_p99": round(percentile(latencies, 99), 4),
+        "latency_max": round(max(latencies), 4),
+        "latency_mean": round(statistics.mean(latencies), 4),
+        "missing_feeds_per_run": round(missing / runs, 2),
+        "peak_mb": round(peak / 1024 / 1024, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS 流水线基准测试（离线）')
+    parser.add_argument('--feeds', help='语料名称（逗号分隔），默认全部')
+    parser.add_argument('--runs', type=int, default=5, help='端到端重复次数')
+    parser.add_argument('--latency', type=float, default=0.0, help='替身服务器每请求延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='替身服务器随机失败概率')
+    parser.add_argument('--deadline', type=float, default=feed_fetch.AGGREGATE_DEADLINE,
+                        help='端到端整体截止（秒）')
+    parser.add_argument('--aggregator', default='rss_aggregator_enhanced',
+                        choices=['rss_aggregator', 'rss_aggregator_enhanced'], help='被测聚合器')
+    parser.add_argument('--output', help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.feeds.split(',')] if args.feeds else list(CORPUS)
+    unknown = [n for n in names if n not in CORPUS]
+    if unknown:
+        print(f"❌ 未知语料: {', '.join(unknown)}（可选: {', '.join(CORPUS)}）")
+        sys.exit(1)
+
+    aggregator = importlib.import_module(args.aggregator)
+    server = stub_server.start(latency=args.latency, fail_rate=args.fail_rate,
+                               documents=build_corpus(names))
+    print(f"🧪 替身服务器: {server.base_url}（{len(names)} 份语料）")
+
+    feed_config = {"category": "基准测试", "weight": 1.0}
+    stages = bench_stages(server.base_url, names, aggregator.score_item, feed_config)
+    e2e = bench_end_to_end(server.base_url, names, aggregator, args.runs, args.deadline)
+
+    print(f"\n{'阶段':<10}{'耗时(s)':>10}{'条目':>8}{'条目/秒':>12}{'字节':>12}{'峰值(MB)':>10}")
+    for s in stages:
+        print(f"{s['stage']:<10}{s['seconds']:>10}{s['items']:>8}{s['items_per_sec']:>12}"
+              f"{s['bytes']:>12}{s['peak_mb']:>10}")
+    print(f"\n端到端 × {e2e['runs']}: {e2e['items_per_sec']} 条目/秒 | "
+          f"p50 {e2e['latency_p50']}s p90 {e2e['latency_p90']}s "
+          f"p99 {e2e['latency_p99']}s max {e2e['latency_max']}s | "
+          f"缺失 {e2e['missing_feeds_per_run']} 源/次 | 峰值 {e2e['peak_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "timestamp": datetime.now().isoformat(),
+                "aggregator": args.aggregator,
+                "feeds": names,
+                "latency": args.latency,
+                "fail_rate": args.fail_rate,
+                "stages": stages + [e2e]
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+RSS 抓取 - 带超时预算的并发抓取
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+- 单源预算：每次下载有总时长上限（不只是 socket 超时）
+- 整体截止：到点立即返回已完成的源，未完成的标记为缺失
+- 对冲重试：某个源超过 hedge_after 秒未返回，再发一个并行请求，先到先用
+"""
+
+import queue
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from urllib.request import urlopen, Request
+
+import feedparser
+
+FEED_TIMEOUT = 15.0         # 单源预算（秒）
+AGGREGATE_DEADLINE = 45.0   # 整体截止（秒）
+ITEMS_PER_FEED = 10         # 每个源取前10条
+READ_CHUNK = 64 * 1024
+
+USER_AGENT = "Mozilla/5.0 (compatible; MemoryLab-RSS/1.0)"
+
+def download_feed(feed_url: str, timeout: float = FEED_TIMEOUT) -> Tuple[bytes, Dict[str, str]]:
+    """下载 feed 原文，总耗时超过 timeout 抛 TimeoutError"""
+    budget_end = time.monotonic() + timeout
+    req = Request(feed_url, headers={"User-Agent": USER_AGENT})
+    with urlopen(req, timeout=timeout) as response:
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        chunks = []
+        while True:
+            if time.monotonic() > budget_end:
+                raise TimeoutError(f"超过单源预算 {timeout:.0f}s")
+            chunk = response.read(READ_CHUNK)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks), headers
+
+def parse_feed(raw: bytes, headers: Optional[Dict[str, str]] = None,
+               limit: int = ITEMS_PER_FEED) -> List[Dict[str, Any]]:
+    """解析 feed 原文为条目列表"""
+    feed = feedparser.parse(raw, response_headers=headers or {})
+    items = []
+    for entry in feed.entries[:limit]:
+        items.append({
+            "title": entry.get("title", ""),
+            "link": entry.get("link", ""),
+            "summary": entry.get("summary", ""),
+            "published": entry.get("published", ""),
+            "source": feed.feed.get("title", "Unknown")
+        })
+    return items
+
+def fetch_feed(feed_url: str, timeout: float = FEED_TIMEOUT) -> List[Dict[str, Any]]:
+    """抓取并解析单个 feed"""
+    raw, headers = download_feed(feed_url, timeout)
+    return parse_feed(raw, headers)
+
+def fetch_feeds(feeds: Dict[str, Dict[str, Any]],
+                deadline: float = AGGREGATE_DEADLINE,
+                feed_timeout: float = FEED_TIMEOUT,
+                hedge_after: Optional[float] = None
+                ) -> Iterator[Tuple[str, Optional[List[Dict[str, Any]]], Optional[str]]]:
+    """
+    并发抓取所有源，按完成顺序产出 (name, items, error)
+
+    每个源恰好产出一次：成功时 error 为 None；失败或到达整体截止时
+    items 为 None、error 说明原因。工作线程是 daemon，卡住的连接
+    不会拖住调用方或进程退出。
+    """
+    results = queue.Queue()
+    start = time.monotonic()
+    end = start + deadline
+
+    def worker(name, attempt):
+        try:
+            items = fetch_feed(feeds[name]["url"], feed_timeout)
+            results.put((name, attempt, items, None))
+        except Exception as e:
+            results.put((name, attempt, None, str(e) or type(e).__name__))
+
+    def launch(name, attempt):
+        state[name]["running"] += 1
+        state[name]["attempts"] += 1
+        threading.Thread(target=worker, args=(name, attempt), daemon=True).start()
+
+    state = {name: {"running": 0, "attempts": 0} for name in feeds}
+    for name in feeds:
+        launch(name, 0)
+
+    pending = set(feeds)
+    while pending:
+        now = time.monotonic()
+        if now >= end:
+            break
+
+        # 对冲：超过 hedge_after 仍无结果的源，补发一次请求
+        wait = end - now
+        if hedge_after is not None:
+            hedge_at = start + hedge_after
+            if now >= hedge_at:
+                for name in pending:
+                    if state[name]["attempts"] == 1 and state[name]["running"] == 1:
+                        launch(name, 1)
+            else:
+                wait = min(wait, hedge_at - now)
+
+        try:
+            name, attempt, items, error = results.get(timeout=wait)
+        except queue.Empty:
+            continue
+
+        if name not in pending:
+            continue  # 对冲请求中较慢的一个
+        state[name]["running"] -= 1
+        if error is None:
+            pending.discard(name)
+            yield name, items, None
+        elif state[name]["running"] == 0:
+            pending.discard(name)
+            yield name, None, error
+        # 否则另一个对冲请求还在跑，继续等
+
+    for name in feeds:
+        if name in pending:
+            yield name, None, f"超过整体截止 {deadline:.0f}s"
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+HTML → 纯文本 - 流式提取，预算用完立即停止
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+基于标准库 html.parser：去掉所有标签，解码实体，跳过 script/style
+等不可见内容。按块喂入解析器，字数或字符预算一到就不再继续解析，
+所以长文档的处理量只和预算有关，和原文长度无关。
+
+用于 rss_aggregator*.py 的摘要清洗和 clawd-extract.py 的页面正文提取。
+"""
+
+from html.parser import HTMLParser
+from typing import Optional, Tuple
+
+SKIP_TAGS = ("script", "style", "noscript", "template")
+CHUNK_SIZE = 4096
+MAX_PENDING = 64 * 1024     # 超长文本节点攒到这么多就先处理，避免无界缓冲
+
+class TextExtractor(HTMLParser):
+    """
+    增量提取文本
+
+    每个文本节点去掉首尾空白后用 separator 连接（等价于
+    BeautifulSoup 的 get_text(separator, strip=True)）。
+    max_words / max_chars 任一达到即停止，truncated 标记是否还有剩余内容。
+    """
+    def __init__(self, max_words: Optional[int] = None, max_chars: Optional[int] = None,
+                 separator: str = " ", skip_tags: Tuple[str, ...] = SKIP_TAGS):
+        super().__init__(convert_charrefs=True)
+        self.max_words = max_words
+        self.max_chars = max_chars
+        self.separator = separator
+        self.skip_tags = set(skip_tags)
+        self.parts = []
+        self.words = 0
+        self.chars = 0
+        self.title = ""
+        self.done = False
+        self.truncated = False
+        self._skip_depth = 0
+        self._in_title = False
+        self._pending = []
+        self._pending_size = 0
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in self.skip_tags:
+            self._skip_depth += 1
+        elif tag == "title" and not self.title:
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in self.skip_tags and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_comment(self, data):
+        self._flush()
+
+    handle_decl = handle_pi = handle_comment
+
+    def handle_data(self, data):
+        # 按块喂入时一个文本节点可能被切成几段，攒到下一个标签再处理
+        if not self.done and not self._skip_depth:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            if self._pending_size > MAX_PENDING:
+                # 超长节点在最后一个空白处切开，剩下的半个词留到下一段
+                data = "".join(self._pending)
+                cut = max(data.rfind(" "), data.rfind("\n"), data.rfind("\t"))
+                if cut > 0:
+                    self._pending = [data[:cut]]
+                    self._flush()
+                    self._pending = [data[cut:]]
+                    self._pending_size = len(data) - cut
+                else:
+                    self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        if self.done:
+            return
+        if self._in_title:
+            self.title += data
+
+        if self.max_words is not None:
+            for word in data.split():
+                if self.words >= self.max_words:
+                    self._stop()
+                    return
+                self._append(word)
+                self.words += 1
+        else:
+            text = data.strip()
+            if text:
+                self._append(text)
+
+    def _append(self, text):
+        if self.parts:
+            self.chars += len(self.separator)
+        if self.max_chars is not None and self.chars + len(text) > self.max_chars:
+            text = text[:max(0, self.max_chars - self.chars)]
+            if text:
+                self.parts.append(text)
+            self._stop()
+            return
+        self.parts.append(text)
+        self.chars += len(text)
+
+    def _stop(self):
+        self.done = True
+        self.truncated = True
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def feed_chunks(self, chunks):
+        """逐块喂入，预算用完即返回；返回 True 表示已停止"""
+        for chunk in chunks:
+            self.feed(chunk)
+            if self.done:
+                return True
+        return False
+
+    def extract(self, html: str, chunk_size: int = CHUNK_SIZE) -> str:
+        """按块解析整段 HTML，返回提取的文本"""
+        chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+        if not self.feed_chunks(chunks):
+            self.close()
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return self.separator.join(self.parts)
+
+def html_to_text(html: str, max_words: Optional[int] = None, max_chars: Optional[int] = None,
+                 separator: str = " ", skip_tags: Tuple[str, ...] = SKIP_TAGS) -> str:
+    """HTML 转纯文本，可选字数/字符上限"""
+    if not html:
+        return ""
+    return TextExtractor(max_words, max_chars, separator, skip_tags).extract(html)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+HTTP 客户端 - 连接复用、压缩协商、超时与重试
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+整个进程共用一个 requests.Session：
+- 按 host 保持 keep-alive 连接池，批量抓取和 GLM 调用不再每次重新握手
+- Accept-Encoding 协商 gzip/deflate，装了 brotli 时加上 br
+- 连接超时和读取超时分开设置
+- 连接错误、超时和 429/5xx 自动重试，指数退避 + 抖动，尊重 Retry-After
+"""
+
+import random
+import sys
+import threading
+import time
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401  urllib3 检测到即可解码 br
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 20.0
+RETRIES = 2                 # 首次之外的重试次数
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 10.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POOL_SIZE = 32              # 每个 host 的连接数上限，不小于批量模式的并发
+
+Timeout = Union[float, Tuple[float, float]]
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """进程内共享的 Session（线程安全地创建一次）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+                _session = session
+    return _session
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """指数退避 + 抖动，不超过 cap 秒"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay * (0.5 + random.random() / 2)
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Retry-After 头给出的等待秒数（有上限），没有则 None"""
+    value = response.headers.get("Retry-After")
+    try:
+        return min(BACKOFF_MAX * 6, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+def request(method: str, url: str, retries: int = RETRIES,
+            timeout: Timeout = (CONNECT_TIMEOUT, READ_TIMEOUT),
+            backoff_base: float = BACKOFF_BASE, **kwargs) -> requests.Response:
+    """
+    发送请求，连接错误 / 超时 / 429 / 5xx 时重试
+
+    重试用完后返回最后一次的响应（由调用方判断状态码），或抛出最后一次的异常。
+    stream=True 时只重试拿到响应之前的阶段。
+    """
+    session = get_session()
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt, backoff_base))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        delay = retry_after(response)
+        response.close()
+        wait = delay if delay is not None else backoff_delay(attempt, backoff_base)
+        print(f"⚠️  HTTP {response.status_code}，{wait:.1f} 秒后重试...", file=sys.stderr)
+        time.sleep(wait)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+令牌桶限速 - 预约式取令牌
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+桶容量 burst，每秒补充 rate 个令牌。取令牌不足时余额记为负数，
+返回需要等待的秒数：调用方自己睡，等待期间不占锁，按预约顺序依次放行。
+
+TokenBucket 是线程安全的进程内令牌桶（tech_news.py 的抓取限速）；
+take 是它的计算部分，clawd-extract.py 的跨进程 RateLimiter 用它更新存在文件里的桶。
+"""
+
+import threading
+import time
+from typing import Tuple
+
+def take(tokens: float, elapsed: float, rate: float, burst: float,
+         count: float = 1) -> Tuple[float, float]:
+    """
+    从余额 tokens 的桶里预约 count 个令牌（距上次更新 elapsed 秒）
+
+    返回 (新余额, 需要等待的秒数)。
+    """
+    if rate <= 0:
+        raise ValueError(f"rate 必须大于 0: {rate}")
+    available = min(burst, tokens + max(0.0, elapsed) * rate) - count
+    return available, (0.0 if available >= 0 else -available / rate)
+
+class TokenBucket:
+    """进程内令牌桶（线程安全），初始是满的"""
+    def __init__(self, rate: float, burst: float = 1):
+        if rate <= 0:
+            raise ValueError(f"rate 必须大于 0: {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, count: float = 1) -> float:
+        """预约 count 个令牌，返回需要等待的秒数（0 表示立即可用）"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens, wait = take(self.tokens, now - self.updated, self.rate, self.burst, count)
+            self.updated = now
+            return wait
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+报告输出器 - 单次遍历，多目标增量写出
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+排好序的条目只遍历一次，依次交给各个 sink（markdown / Telegram /
+紧凑 JSON / JSONL）增量写入缓冲文件。文件先写临时文件，全部成功后
+再原子 rename，中途出错不会留下半截报告。
+"""
+
+import io
+import json
+from abc import ABC, abstractmethod
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Iterable, Optional
+
+BUFFER_SIZE = 256 * 1024
+
+class AtomicFile:
+    """写临时文件，commit 时 fsync + rename，abort 时删除"""
+    def __init__(self, path, buffering: int = BUFFER_SIZE):
+        self.path = Path(os.path.expanduser(str(path)))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        self.file = open(fd, "w", encoding="utf-8", buffering=buffering)
+
+    def write(self, text: str):
+        self.file.write(text)
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.chmod(self.tmp_path, 0o644)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+class _StreamTarget:
+    """包装已打开的流（如 sys.stdout），commit/abort 不关闭它"""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str):
+        self.stream.write(text)
+
+    def commit(self):
+        self.stream.flush()
+
+    def abort(self):
+        pass
+
+def _open_target(target):
+    if target is None:
+        return _StreamTarget(io.StringIO())
+    if isinstance(target, (str, Path)):
+        return AtomicFile(target)
+    return _StreamTarget(target)
+
+class Sink(ABC):
+    """输出目标基类：begin → item × N → end"""
+    def __init__(self, target=None, limit: Optional[int] = None):
+        self.target = target
+        self.limit = limit
+        self.out = None
+
+    def begin(self, meta: Dict[str, Any]):
+        self.out = _open_target(self.target)
+
+    @abstractmethod
+    def item(self, index: int, item: Dict[str, Any]):
+        """写出第 index 条"""
+
+    def end(self, meta: Dict[str, Any]):
+        self.out.commit()
+
+    def abort(self):
+        if self.out is not None:
+            self.out.abort()
+
+    def getvalue(self) -> str:
+        """target 为 None 时写入内存，用它取回内容"""
+        return self.out.stream.getvalue()
+
+class TextSink(Sink):
+    """用渲染函数逐条写出文本（markdown / Telegram / 终端）"""
+    def __init__(self, target=None, render_item: Callable[[int, Dict[str, Any]], str] = None,
+                 render_header: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 render_footer: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 limit: Optional[int] = None):
+        super().__init__(target, limit)
+        self.render_item = render_item
+        self.render_header = render_header
+        self.render_footer = render_footer
+
+    def begin(self, meta):
+        super().begin(meta)
+        if self.render_header:
+            self.out.write(self.render_header(meta))
+
+    def item(self, index, item):
+        self.out.write(self.render_item(index, item))
+
+    def end(self, meta):
+        if self.render_footer:
+            self.out.write(self.render_footer(meta))
+        super().end(meta)
+
+class JsonSink(Sink):
+    """紧凑 JSON：{meta..., items_key: [item, ...]}，条目逐个写出"""
+    def __init__(self, target=None, items_key: str = "items", limit: Optional[int] = None):
+        super().__init__(target, limit)
+        self.items_key = items_key
+        self.count = 0
+
+    def begin(self, meta):
+        super().begin(meta)
+        self.count = 0
+        self.out.write("{")
+        for key, value in meta.items():
+            self.out.write(f"{json.dumps(key)}:{_dumps(value)},")
+        self.out.write(f"{json.dumps(self.items_key)}:[")
+
+    def item(self, index, item):
+        if self.count:
+            self.out.write(",")
+        self.out.write(_dumps(item))
+        self.count += 1
+
+    def end(self, meta):
+        self.out.write("]}\n")
+        super().end(meta)
+
+class JsonlSink(Sink):
+    """JSONL：每行一个条目"""
+    def item(self, index, item):
+        self.out.write(_dumps(item))
+        self.out.write("\n")
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def emit(items: Iterable[Dict[str, Any]], sinks: List[Sink],
+         meta: Optional[Dict[str, Any]] = None):
+    """遍历一次条目写出到所有 sink；任何一个出错则全部放弃"""
+    meta = meta or {}
+    limits = [s.limit for s in sinks]
+    stop = None if None in limits else max(limits, default=0)
+
+    try:
+        for sink in sinks:
+            sink.begin(meta)
+        for index, item in enumerate(items):
+            if stop is not None and index >= stop:
+                break
+            for sink in sinks:
+                if sink.limit is None or index < sink.limit:
+                    sink.item(index, item)
+        for sink in sinks:
+            sink.end(meta)
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
@@ -4,10 +4,17 @@
 作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
 """
 
-import feedparser
-import json
+import sys
 from datetime import datetime
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+import feed_archive
+import feed_fetch
+import html_text
+import report_emitter
+import telegram_outbox
 
 # RSS 源配置
 RSS_FEEDS = {
@@ -33,23 +40,11 @@ RSS_FEEDS = {
     }
 }
 
-def fetch_rss(feed_url: str) -> List[Dict[str, Any]]:
-    """抓取单个 RSS feed"""
-    try:
-        feed = feedparser.parse(feed_url)
-        items = []
-        for entry in feed.entries[:10]:  # 每个源取前10条
-            items.append({
-                "title": entry.get("title", ""),
-                "link": entry.get("link", ""),
-                "summary": entry.get("summary", ""),
-                "published": entry.get("published", ""),
-                "source": feed.feed.get("title", "Unknown")
-            })
-        return items
-    except Exception as e:
-        print(f"❌ 抓取失败 {feed_url}: {e}")
-        return []
+FEED_TIMEOUT = 15.0         # 单源预算（秒）
+AGGREGATE_DEADLINE = 45.0   # 整体截止（秒），到点返回已完成的部分
+HEDGE_AFTER = None          # 设为秒数可对慢源发起对冲请求
+TOP_N = 10
+SCORE_WORDS = 200           # 评分只看摘要前 200 个词
 
 def score_item(item: Dict[str, Any], feed_config: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -60,7 +55,8 @@ def score_item(item: Dict[str, Any], feed_config: Dict[str, Any]) -> Dict[str, A
     - 参考价值 (Reference value)
     """
     title = item.get("title", "").lower()
-    summary = item.get("summary", "").lower()
+    # 只看正文文字，不让标签属性里的 URL 参与关键词匹配
+    summary = html_text.html_to_text(item.get("summary", ""), max_words=SCORE_WORDS).lower()
     text = title + " " + summary
 
     # AI 相关性关键词
@@ -89,24 +85,29 @@ def score_item(item: Dict[str, Any], feed_config: Dict[str, Any]) -> Dict[str, A
         "actionability": round(action_score, 3)
     }
 
-def aggregate_all() -> List[Dict[str, Any]]:
-    """聚合所有 RSS 源"""
+def aggregate_all(deadline: float = AGGREGATE_DEADLINE) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """聚合所有 RSS 源，到截止时间返回已完成的部分和缺失的源"""
     all_items = []
+    missing = []
 
-    for feed_name, config in RSS_FEEDS.items():
-        print(f"📡 抓取 {feed_name}...")
-        items = fetch_rss(config["url"])
+    print(f"📡 并发抓取 {len(RSS_FEEDS)} 个源（截止 {deadline:.0f}s）...")
+    for feed_name, items, error in feed_fetch.fetch_feeds(
+            RSS_FEEDS, deadline=deadline, feed_timeout=FEED_TIMEOUT, hedge_after=HEDGE_AFTER):
+        if error:
+            print(f"   ❌ {feed_name}: {error}")
+            missing.append({"feed": feed_name, "error": error})
+            continue
 
         for item in items:
-            scored = score_item(item, config)
+            scored = score_item(item, RSS_FEEDS[feed_name])
             all_items.append(scored)
 
-        print(f"   ✅ {len(items)} 条")
+        print(f"   ✅ {feed_name}: {len(items)} 条")
 
     # 按评分排序
     all_items.sort(key=lambda x: x["aidar_score"], reverse=True)
 
-    return all_items
+    return all_items, missing
 
 def format_item(item: Dict[str, Any]) -> str:
     """格式化单条内容"""
@@ -189,54 +190,56 @@ def analyze_value_for_glm(item: Dict[str, Any]) -> Dict[str, List[str]]:
         "integrable": "✅ 可集成到 Memory Lab" if item["ai_relevance"] > 0.2 else "📚 可学习参考"
     }
 
+TELEGRAM_DIVIDER = "─" * 30 + "\n\n"
+
+def format_telegram_header(meta: Dict[str, Any]) -> str:
+    """Telegram 消息头"""
+    return f"🧠 **每日科技精选**\n📅 {datetime.now().strftime('%Y-%m-%d')}\n" + TELEGRAM_DIVIDER
+
+def format_telegram_item(index: int, item: Dict[str, Any]) -> str:
+    """Telegram 消息中的单条内容（index 从 0 开始）"""
+    emoji = "🔥" if item["aidar_score"] > 0.3 else "📌"
+    lines = [
+        f"{index + 1}. {emoji} **{item['title'][:80]}**\n",
+        f"   📂 {item['category']} | 评分 {item['aidar_score']}\n\n"
+    ]
+
+    # 对用户的价值
+    user_value = analyze_value_for_user(item)
+    lines.append("   **对你的价值**：\n")
+    lines.extend(f"   • {v}\n" for v in user_value["values"][:3])
+    lines.append(f"   • {user_value['actionable']}\n\n")
+
+    # 对 GLM 的价值
+    glm_value = analyze_value_for_glm(item)
+    lines.append("   **对 GLM 的价值**：\n")
+    lines.extend(f"   • {v}\n" for v in glm_value["values"][:3])
+    lines.append(f"   • {glm_value['integrable']}\n\n")
+
+    lines.append(f"   🔗 {item['link']}\n")
+    lines.append(TELEGRAM_DIVIDER)
+    return "".join(lines)
+
+def format_telegram_footer(meta: Dict[str, Any]) -> str:
+    return "🤖 Memory Lab Team (GLM + DeepSeek + Clawdbot)"
+
 def format_for_telegram(top_items: List[Dict[str, Any]]) -> str:
     """格式化为 Telegram 消息（详细版）"""
-    msg = "🧠 **每日科技精选**\n"
-    msg += f"📅 {datetime.now().strftime('%Y-%m-%d')}\n"
-    msg += "─" * 30 + "\n\n"
-
-    for i, item in enumerate(top_items, 1):
-        emoji = "🔥" if item["aidar_score"] > 0.3 else "📌"
-        msg += f"{i}. {emoji} **{item['title'][:80]}**\n"
-        msg += f"   📂 {item['category']} | 评分 {item['aidar_score']}\n\n"
-        
-        # 对用户的价值
-        user_value = analyze_value_for_user(item)
-        msg += f"   **对你的价值**：\n"
-        for v in user_value["values"][:3]:
-            msg += f"   • {v}\n"
-        msg += f"   • {user_value['actionable']}\n\n"
-        
-        # 对 GLM 的价值
-        glm_value = analyze_value_for_glm(item)
-        msg += f"   **对 GLM 的价值**：\n"
-        for v in glm_value["values"][:3]:
-            msg += f"   • {v}\n"
-        msg += f"   • {glm_value['integrable']}\n\n"
-        
-        msg += f"   🔗 {item['link']}\n"
-        msg += "─" * 30 + "\n\n"
-
-    msg += "🤖 Memory Lab Team (GLM + DeepSeek + Clawdbot)"
-
-    return msg
+    sink = report_emitter.TextSink(render_item=format_telegram_item,
+                                   render_header=format_telegram_header,
+                                   render_footer=format_telegram_footer)
+    report_emitter.emit(top_items, [sink])
+    return sink.getvalue()
 
 def send_to_telegram(message: str) -> bool:
-    """发送到 Telegram（通过 clawdbot）"""
+    """推送到 Telegram（通过 clawdbot）：写入发件箱后由后台进程投递，不阻塞"""
     try:
-        import requests
-        # 使用本地 clawdbot API
-        response = requests.post(
-            "http://localhost:3000/api/send",
-            json={
-                "channel": "telegram",
-                "message": message
-            },
-            timeout=10
-        )
-        return response.status_code == 200
+        outbox = telegram_outbox.Outbox()
+        outbox.enqueue(message)
+        telegram_outbox.spawn_drainer(outbox.dir)
+        return True
     except Exception as e:
-        print(f"❌ Telegram 推送失败: {e}")
+        print(f"❌ 写入 Telegram 发件箱失败: {e}")
         return False
 
 def main():
@@ -244,39 +247,45 @@ def main():
     print("=" * 60)
 
     # 聚合
-    items = aggregate_all()
-
-    print(f"\n✅ 共 {len(items)} 条内容")
-    print(f"📊 筛选 Top 10（评分 > 0.2）:\n")
+    items, missing = aggregate_all()
 
-    # 筛选 Top 10
-    top_items = [i for i in items if i["aidar_score"] > 0.2][:10]
+    # 归档全部评分条目，便于检索历史
+    try:
+        count = feed_archive.archive_items(items)
+        print(f"🗄️ 已归档 {count} 条到 {feed_archive.ARCHIVE_PATH}")
+    except Exception as e:
+        print(f"⚠️ 归档失败: {e}")
 
-    for i, item in enumerate(top_items, 1):
-        print(f"{i}. {format_item(item)}")
+    print(f"\n✅ 共 {len(items)} 条内容")
+    if missing:
+        print(f"⚠️ {len(missing)} 个源未完成: {', '.join(m['feed'] for m in missing)}")
+    print(f"📊 筛选 Top {TOP_N}（评分 > 0.2）:\n")
 
-    # 保存
+    # 筛选 Top 10，一次遍历写出终端、JSON 和 Telegram 三个目标
+    top_items = (i for i in items if i["aidar_score"] > 0.2)
     output_path = "~/clawd-glm/cache/rss_aggregated.json"
-    output_path = os.path.expanduser(output_path)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, 'w') as f:
-        json.dump({
-            "timestamp": datetime.now().isoformat(),
-            "total": len(items),
-            "top_items": top_items
-        }, f, indent=2, ensure_ascii=False)
 
-    print(f"\n💾 已保存到 {output_path}")
+    console = report_emitter.TextSink(sys.stdout, limit=TOP_N,
+                                      render_item=lambda i, item: f"{i + 1}. {format_item(item)}\n")
+    json_sink = report_emitter.JsonSink(output_path, items_key="top_items", limit=TOP_N)
+    telegram = report_emitter.TextSink(limit=TOP_N,
+                                       render_item=format_telegram_item,
+                                       render_header=format_telegram_header,
+                                       render_footer=format_telegram_footer)
+    report_emitter.emit(top_items, [console, json_sink, telegram], meta={
+        "timestamp": datetime.now().isoformat(),
+        "total": len(items),
+        "missing_feeds": missing
+    })
+
+    print(f"\n💾 已保存到 {json_sink.out.path}")
 
     # Telegram 推送
-    if top_items:
-        msg = format_for_telegram(top_items)
-        if send_to_telegram(msg):
-            print("✅ 已推送到 Telegram")
+    if json_sink.count:
+        if send_to_telegram(telegram.getvalue()):
+            print("✅ 已加入 Telegram 推送队列（后台投递）")
         else:
             print("⚠️ Telegram 推送失败，内容已保存")
 
 if __name__ == '__main__':
-    import os
     main()
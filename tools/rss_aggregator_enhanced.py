@@ -5,10 +5,16 @@
 功能：详细推送 + 双向价值分析
 """
 
-import feedparser
-import json
+import sys
 from datetime import datetime
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+import feed_archive
+import feed_fetch
+import html_text
+import report_emitter
 
 # RSS 源配置
 RSS_FEEDS = {
@@ -34,23 +40,11 @@ RSS_FEEDS = {
     }
 }
 
-def fetch_rss(feed_url: str) -> List[Dict[str, Any]]:
-    """抓取单个 RSS feed"""
-    try:
-        feed = feedparser.parse(feed_url)
-        items = []
-        for entry in feed.entries[:10]:  # 每个源取前10条
-            items.append({
-                "title": entry.get("title", ""),
-                "link": entry.get("link", ""),
-                "summary": entry.get("summary", ""),
-                "published": entry.get("published", ""),
-                "source": feed.feed.get("title", "Unknown")
-            })
-        return items
-    except Exception as e:
-        print(f"❌ 抓取失败 {feed_url}: {e}")
-        return []
+FEED_TIMEOUT = 15.0         # 单源预算（秒）
+AGGREGATE_DEADLINE = 45.0   # 整体截止（秒），到点返回已完成的部分
+HEDGE_AFTER = None          # 设为秒数可对慢源发起对冲请求
+TOP_N = 5
+SUMMARY_WORDS = 50
 
 def analyze_user_value(title: str, summary: str) -> Dict[str, str]:
     """分析对晨旭的价值"""
@@ -128,16 +122,10 @@ def generate_action_recommendation(title: str, summary: str) -> str:
         return "👀 **推荐**：快速浏览，标记感兴趣的部分"
 
 def generate_tech_summary(title: str, summary: str) -> str:
-    """生成技术摘要"""
-    # 简化 summary，提取关键信息
-    summary_clean = summary.replace("<p>", "").replace("</p>", "").replace("\n", " ")
-    words = summary_clean.split()
-    
-    # 取前 50 个词作为摘要
-    if len(words) > 50:
-        return " ".join(words[:50]) + "..."
-    else:
-        return " ".join(words)
+    """生成技术摘要：去掉 HTML 标签和实体，取前 50 个词"""
+    extractor = html_text.TextExtractor(max_words=SUMMARY_WORDS)
+    text = extractor.extract(summary)
+    return text + "..." if extractor.truncated else text
 
 def score_item(item: Dict[str, Any], feed_config: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -187,76 +175,110 @@ def score_item(item: Dict[str, Any], feed_config: Dict[str, Any]) -> Dict[str, A
         "action_recommendation": action
     }
 
-def aggregate_all() -> List[Dict[str, Any]]:
-    """聚合所有 RSS 源"""
+def aggregate_all(deadline: float = AGGREGATE_DEADLINE) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """聚合所有 RSS 源，到截止时间返回已完成的部分和缺失的源"""
     all_items = []
+    missing = []
 
-    for feed_name, config in RSS_FEEDS.items():
-        print(f"📡 抓取 {feed_name}...")
-        items = fetch_rss(config["url"])
+    print(f"📡 并发抓取 {len(RSS_FEEDS)} 个源（截止 {deadline:.0f}s）...")
+    for feed_name, items, error in feed_fetch.fetch_feeds(
+            RSS_FEEDS, deadline=deadline, feed_timeout=FEED_TIMEOUT, hedge_after=HEDGE_AFTER):
+        if error:
+            print(f"   ❌ {feed_name}: {error}")
+            missing.append({"feed": feed_name, "error": error})
+            continue
 
         for item in items:
-            scored_item = score_item(item, config)
+            scored_item = score_item(item, RSS_FEEDS[feed_name])
             all_items.append(scored_item)
 
     # 按评分排序
     all_items.sort(key=lambda x: x["aidar_score"], reverse=True)
-    return all_items
+    return all_items, missing
 
-def format_detailed_report(items: List[Dict[str, Any]], top_n: int = 5) -> str:
-    """格式化详细报告"""
+def format_report_header(meta: Dict[str, Any]) -> str:
+    """详细报告头部（meta: total / top_n / missing_feeds）"""
     report = []
     report.append("# 📡 每日科技内容推送")
     report.append(f"\n📅 **日期**：{datetime.now().strftime('%Y-%m-%d')}")
-    report.append(f"📊 **总数**：{len(items)} 条 | **精选**：{top_n} 条\n")
+    report.append(f"📊 **总数**：{meta['total']} 条 | **精选**：{meta['top_n']} 条\n")
+    if meta.get("missing_feeds"):
+        report.append(f"⚠️ **未完成的源**：{', '.join(m['feed'] for m in meta['missing_feeds'])}\n")
     report.append("---\n")
+    return "\n".join(report) + "\n"
+
+def format_report_item(index: int, item: Dict[str, Any]) -> str:
+    """详细报告中的单条内容（index 从 0 开始）"""
+    report = []
+    report.append(f"## {index + 1}. {item['title']}")
+    report.append(f"\n**来源**：{item['source']} | **评分**：{item['aidar_score']}\n")
+
+    report.append("### 📝 技术摘要")
+    report.append(f"{item['tech_summary']}\n")
+
+    report.append("### 👤 对晨旭的价值")
+    report.append(f"{item['user_value']['summary']}")
+    report.append(f"（优先级：{item['user_value']['priority']}）\n")
 
-    for i, item in enumerate(items[:top_n], 1):
-        report.append(f"## {i}. {item['title']}")
-        report.append(f"\n**来源**：{item['source']} | **评分**：{item['aidar_score']}\n")
-        
-        report.append("### 📝 技术摘要")
-        report.append(f"{item['tech_summary']}\n")
-        
-        report.append("### 👤 对晨旭的价值")
-        report.append(f"{item['user_value']['summary']}")
-        report.append(f"（优先级：{item['user_value']['priority']}）\n")
-        
-        report.append("### 🤖 对 Jarvis 的价值")
-        report.append(f"{item['ai_value']['summary']}")
-        report.append(f"（优先级：{item['ai_value']['priority']}）\n")
-        
-        report.append("### 🎯 推荐行动")
-        report.append(f"{item['action_recommendation']}\n")
-        
-        report.append(f"**链接**：{item['link']}\n")
-        report.append("---\n")
-
-    return "\n".join(report)
+    report.append("### 🤖 对 Jarvis 的价值")
+    report.append(f"{item['ai_value']['summary']}")
+    report.append(f"（优先级：{item['ai_value']['priority']}）\n")
+
+    report.append("### 🎯 推荐行动")
+    report.append(f"{item['action_recommendation']}\n")
+
+    report.append(f"**链接**：{item['link']}\n")
+    report.append("---\n")
+    return "\n".join(report) + "\n"
+
+def format_detailed_report(items: List[Dict[str, Any]], top_n: int = 5,
+                           missing: Optional[List[Dict[str, str]]] = None) -> str:
+    """格式化详细报告"""
+    sink = report_emitter.TextSink(render_item=format_report_item,
+                                   render_header=format_report_header, limit=top_n)
+    report_emitter.emit(items, [sink], meta={
+        "total": len(items), "top_n": top_n, "missing_feeds": missing
+    })
+    return sink.getvalue()
 
 def main():
     print("🚀 开始聚合 RSS 源...\n")
 
     # 聚合所有内容
-    all_items = aggregate_all()
+    all_items, missing = aggregate_all()
 
-    # 生成详细报告
-    report = format_detailed_report(all_items, top_n=5)
+    # 归档全部评分条目，便于检索历史
+    try:
+        count = feed_archive.archive_items(all_items)
+        print(f"🗄️ 已归档 {count} 条到 {feed_archive.ARCHIVE_PATH}")
+    except Exception as e:
+        print(f"⚠️ 归档失败: {e}")
 
-    # 保存到文件
-    output_file = f"/tmp/tech_news_{datetime.now().strftime('%Y%m%d')}.md"
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(report)
+    # 一次遍历写出：markdown 报告、终端、紧凑 JSON、JSONL
+    date = datetime.now().strftime('%Y%m%d')
+    output_file = f"/tmp/tech_news_{date}.md"
+    json_file = f"/tmp/tech_news_{date}.json"
+    jsonl_file = f"/tmp/tech_news_{date}.jsonl"
+
+    print("\n📄 报告：\n")
+    sinks = [
+        report_emitter.TextSink(output_file, render_item=format_report_item,
+                                render_header=format_report_header, limit=TOP_N),
+        report_emitter.TextSink(sys.stdout, render_item=format_report_item,
+                                render_header=format_report_header, limit=TOP_N),
+        report_emitter.JsonSink(json_file, items_key="items"),
+        report_emitter.JsonlSink(jsonl_file)
+    ]
+    report_emitter.emit(all_items, sinks, meta={
+        "timestamp": datetime.now().isoformat(),
+        "total": len(all_items),
+        "top_n": TOP_N,
+        "missing_feeds": missing
+    })
 
     print("\n✅ 完成！")
     print(f"📄 报告已保存：{output_file}")
-    print(f"\n{report}")
-
-    # 保存 JSON 结果
-    json_file = f"/tmp/tech_news_{datetime.now().strftime('%Y%m%d')}.json"
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(all_items, f, ensure_ascii=False, indent=2)
-    print(f"📊 JSON 数据：{json_file}")
+    print(f"📊 JSON 数据：{json_file}（JSONL：{jsonl_file}）")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+本地替身服务器 - 离线测试用
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+模拟 clawdbot 的 /api/send 接口、RSS 源和 GLM 对话接口，支持延迟和故障注入，
+用于在不连外网的情况下验证推送链路、流式分析和做抓取基准测试。
+
+用法:
+  stub_server.py [--port 3000] [--latency 0.2] [--fail-rate 0.3] [--feeds]
+                 [--token-delay 0.05]
+
+接口:
+  POST /api/send      记录消息，按 --fail-rate 随机返回 503
+  GET  /api/messages  返回已收到的消息
+  GET  /feeds/<name>  返回 feed_corpus 中的文档，可用查询参数覆盖：
+                      latency=秒  fail=概率  hang=1（不响应）
+                      rate=字节/秒（限速发送）
+  POST .../chat/completions
+                      GLM 替身：按输入生成固定格式的回复，stream=true 时按 SSE
+                      逐词发送（每词间隔 --token-delay）；打包请求按编号逐条回复
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+SEND_CHUNK = 16 * 1024
+PACKED_ITEM_RE = re.compile(r"<<<ITEM (\d+)>>> ?(\S*)")
+
+class StubServer(ThreadingHTTPServer):
+    """带故障注入配置的替身服务器"""
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, fail_rate=0.0, documents=None, token_delay=0.0):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.token_delay = token_delay
+        self.documents = documents or {}   # name -> (body, content_type)
+        self.messages = []
+        self.completions = []              # 收到的对话请求
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return None
+
+    def _inject(self, latency=None, fail_rate=None):
+        """注入延迟，按概率返回 True 表示本次请求应失败"""
+        latency = self.server.latency if latency is None else latency
+        fail_rate = self.server.fail_rate if fail_rate is None else fail_rate
+        if latency:
+            time.sleep(latency)
+        return random.random() < fail_rate
+
+    def _send_document(self, name, params):
+        if name not in self.server.documents:
+            self._send_json(404, {"error": "unknown feed"})
+            return
+        if params.get("hang"):
+            time.sleep(3600)
+            return
+
+        latency = float(params["latency"]) if "latency" in params else None
+        fail_rate = float(params["fail"]) if "fail" in params else None
+        if self._inject(latency, fail_rate):
+            self._send_json(503, {"error": "injected failure"})
+            return
+
+        body, content_type = self.server.documents[name]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        rate = float(params.get("rate", 0))
+        try:
+            for i in range(0, len(body), SEND_CHUNK):
+                chunk = body[i:i + SEND_CHUNK]
+                self.wfile.write(chunk)
+                if rate:
+                    time.sleep(len(chunk) / rate)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def _completion_text(self, content):
+        """替身回复：打包请求逐条回复，否则给出一段固定格式的分析"""
+        items = PACKED_ITEM_RE.findall(content)
+        if items:
+            return "\n".join(f"<<<RESULT {n}>>>\n替身分析 {url}：要点一；要点二。\n<<<END {n}>>>"
+                             for n, url in items)
+        return (f"替身分析：收到 {len(content)} 字符。"
+                + " ".join(f"要点{i}" for i in range(1, 21)) + "。")
+    
+    def _send_completion(self, payload):
+        messages = payload.get("messages") or [{}]
+        text = self._completion_text(messages[-1].get("content", ""))
+        with self.server.lock:
+            self.server.completions.append(payload)
+        if not payload.get("stream"):
+            self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": text}}]})
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for token in re.findall(r"\S+\s*", text):
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/api/messages":
+            with self.server.lock:
+                self._send_json(200, self.server.messages)
+        elif parts.path.startswith("/feeds/"):
+            params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            self._send_document(parts.path[len("/feeds/"):], params)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/api/send":
+            payload = self._read_json()
+            if payload is None or "message" not in payload:
+                self._send_json(400, {"error": "bad request"})
+            elif self._inject():
+                self._send_json(503, {"error": "injected failure"})
+            else:
+                with self.server.lock:
+                    self.server.messages.append(payload)
+                self._send_json(200, {"ok": True})
+        elif self.path.endswith("/chat/completions"):
+            payload = self._read_json()
+            if payload is None:
+                self._send_json(400, {"error": "bad request"})
+            elif self._inject():
+                self._send_json(503, {"error": "injected failure"})
+            else:
+                self._send_completion(payload)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+def start(port=0, latency=0.0, fail_rate=0.0, documents=None, host="127.0.0.1", token_delay=0.0):
+    """在后台线程启动替身服务器，返回 server（用 server.base_url 取地址）"""
+    server = StubServer((host, port), latency=latency, fail_rate=fail_rate, documents=documents,
+                        token_delay=token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='本地替身服务器')
+    parser.add_argument('--port', type=int, default=3000, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='随机失败概率 0~1')
+    parser.add_argument('--feeds', action='store_true', help='同时提供 feed_corpus 中的 RSS 文档')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='流式对话每个词的间隔（秒）')
+    args = parser.parse_args()
+
+    documents = None
+    if args.feeds:
+        import feed_bench
+        documents = feed_bench.build_corpus()
+
+    server = StubServer(("127.0.0.1", args.port), latency=args.latency,
+                        fail_rate=args.fail_rate, documents=documents, token_delay=args.token_delay)
+    print(f"🧪 替身服务器: {server.base_url}")
+    print(f"   GLM_API_URL={server.base_url}/chat/completions")
+    for name in sorted(server.documents):
+        print(f"   {server.base_url}/feeds/{name}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -11,20 +11,22 @@ Tech News Pro - 科技资讯聚合器增强版
 """
 
 import subprocess
+import contextlib
 import json
 import sys
 import os
 import time
 import re
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
 
-# 翻译
-from deep_translator import GoogleTranslator
-
 # 导入 media_grab
 sys.path.insert(0, str(Path(__file__).parent))
 from media_grab import TwitterGrabber
+from translation_service import TranslationService, TranslationQueue, get_backend, BACKENDS
+from rate_limit import TokenBucket
 
 # ==================== 科技博主列表（扩展） ====================
 
@@ -67,8 +69,8 @@ TECH_ACCOUNTS = {
     "benedictevans": {"name": "Benedict Evans", "desc": "科技分析师", "priority": 4, "category": "科技媒体"},
 }
 
-# 默认博主（按优先级）
-DEFAULT_ACCOUNTS = [
+# 精选博主（优先级 4-5），--featured 只抓这些；默认抓全部 TECH_ACCOUNTS
+FEATURED_ACCOUNTS = [
     # Priority 5
     "karpathy", "sama", "ylecun", "paulg", "naval", "demishassabis", "elonmusk",
     # Priority 4
@@ -76,6 +78,13 @@ DEFAULT_ACCOUNTS = [
     "benedictevans", "jeffdean"
 ]
 
+# ==================== 抓取参数 ====================
+
+ACCOUNT_WORKERS = 4         # 同时抓取的账号数；每个线程用自己的 grabber，发起频率由 FETCH_RATE 统一限制
+ACCOUNT_TIMEOUT = 20.0      # 单个账号的时间预算（秒），超时按失败处理
+FETCH_RATE = 4.0            # 全局限速：每秒最多发起几个账号的抓取
+FETCH_BURST = 4             # 允许连发的个数
+
 # ==================== 高价值关键词 ====================
 
 VALUABLE_PATTERNS = {
@@ -105,49 +114,9 @@ NOISE_PATTERNS = [
 
 # ==================== 翻译优化 ====================
 
-def smart_translate(text, target_lang='zh-CN'):
-    """智能翻译：分段处理，提高准确性"""
-    if not text or len(text) < 5:
-        return text
-    
-    # 如果主要是中文，跳过
-    chinese_ratio = len(re.findall(r'[\u4e00-\u9fff]', text)) / len(text)
-    if chinese_ratio > 0.3:
-        return text
-    
-    try:
-        translator = GoogleTranslator(source='auto', target=target_lang)
-        
-        # 分段翻译（避免长文本翻译不准确）
-        if len(text) > 500:
-            paragraphs = text.split('\n\n')
-            translated = []
-            for p in paragraphs:
-                if len(p) > 400:
-                    # 再分段
-                    sentences = re.split(r'([.!?。！？])', p)
-                    chunks = []
-                    current = ""
-                    for i in range(0, len(sentences), 2):
-                        s = sentences[i] + (sentences[i+1] if i+1 < len(sentences) else "")
-                        if len(current) + len(s) < 400:
-                            current += s
-                        else:
-                            if current:
-                                chunks.append(current)
-                            current = s
-                    if current:
-                        chunks.append(current)
-                    
-                    for chunk in chunks:
-                        translated.append(translator.translate(chunk))
-                else:
-                    translated.append(translator.translate(p))
-            return '\n\n'.join(translated)
-        else:
-            return translator.translate(text)
-    except Exception as e:
-        return f"[翻译失败]"
+BRIEF_CHARS = 150           # 简洁模式显示的字符数
+HOT_LIMIT = 3               # 热点内容条数
+HOT_SCORE = 50
 
 # ==================== 价值判断 ====================
 
@@ -206,11 +175,22 @@ def deduplicate_tweets(tweets):
     
     return unique
 
+def rank_tweets(tweets, order=None):
+    """排名：先按账号顺序排好再去重，然后按价值分数降序（同分保持账号顺序）"""
+    if order:
+        tweets = sorted(tweets, key=lambda t: order.get(t.get("author"), len(order)))
+    ranked = deduplicate_tweets(tweets)
+    ranked.sort(key=lambda t: t.get("value_score", 0), reverse=True)
+    return ranked
+
 # ==================== 简报生成器 ====================
 
 class TechNewsPro:
-    def __init__(self):
+    def __init__(self, translator="google"):
         self.grabber = TwitterGrabber()
+        self.idle_grabbers = queue.LifoQueue()     # 空闲的 grabber，一个 grabber 同时只给一个线程用
+        self.idle_grabbers.put(self.grabber)
+        self.translator = TranslationService(get_backend(translator))
         self.cache_dir = Path.home() / ".cache" / "tech_news"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.state_file = self.cache_dir / "state.json"
@@ -229,94 +209,189 @@ class TechNewsPro:
         with open(self.state_file, 'w') as f:
             json.dump(self.state, f)
     
-    def get_account_tweets(self, username, count=2):
-        """获取单个账号的推文"""
-        print(f"  📥 @{username}...", flush=True)
+    @contextlib.contextmanager
+    def _grabber(self):
+        """借一个空闲的 grabber，没有就新建；逐个抓取时始终复用同一个"""
+        try:
+            grabber = self.idle_grabbers.get_nowait()
+        except queue.Empty:
+            grabber = TwitterGrabber()
         try:
-            tweets = self.grabber.get_tweets_safari(username, count)
-            # 过滤已看过的
-            new_tweets = []
-            for t in tweets:
-                if t.get("link") and t["link"] not in self.state["seen_ids"]:
-                    new_tweets.append(t)
-            return new_tweets
-        except Exception as e:
-            print(f"    ✗ {e}", flush=True)
-            return []
+            yield grabber
+        finally:
+            self.idle_grabbers.put(grabber)
     
-    def generate_report(self, accounts=None, count_per_account=2, limit=7):
-        """生成科技简报"""
+    def _new_tweets(self, username, count):
+        """抓取并过滤已看过的推文（出错直接抛出）"""
+        with self._grabber() as grabber:
+            tweets = grabber.get_tweets_safari(username, count)
+        seen = set(self.state["seen_ids"])
+        return [t for t in tweets if t.get("link") and t["link"] not in seen]
+    
+    def fetch_accounts(self, accounts, count=2, workers=ACCOUNT_WORKERS,
+                       timeout=ACCOUNT_TIMEOUT, rate=FETCH_RATE):
+        """
+        并发抓取多个账号，按完成顺序产出 (username, tweets, error)
+        
+        最多 workers 个账号同时抓取，发起抓取受全局限速；
+        单个账号超过 timeout 秒（从获得令牌起算）按失败产出，不再等它。
+        工作线程是 daemon，卡住的抓取不会拖住报告和进程退出；
+        超时的线程真正结束前仍占着并发名额。名额全被卡住的线程占着时，
+        最多再等 timeout 秒，还没有线程结束就放弃剩下的账号。
+        """
+        workers = max(1, workers)
+        results = queue.Queue()
+        limiter = TokenBucket(rate, max(1, min(FETCH_BURST, workers)))
+        waiting = list(accounts)
+        running = {}    # username -> 截止时间
+        hung = set()    # 已超时但线程还没结束的账号
+        
+        def worker(username, delay):
+            if delay:
+                time.sleep(delay)
+            try:
+                results.put((username, self._new_tweets(username, count), None))
+            except Exception as e:
+                results.put((username, None, str(e) or type(e).__name__))
+        
+        while waiting or running:
+            while waiting and len(running) + len(hung) < workers:
+                username = waiting.pop(0)
+                delay = limiter.reserve()
+                running[username] = time.monotonic() + delay + timeout
+                threading.Thread(target=worker, args=(username, delay), daemon=True).start()
+            
+            wait = max(0.0, min(running.values()) - time.monotonic()) if running else timeout
+            try:
+                username, tweets, error = results.get(timeout=wait)
+            except queue.Empty:
+                if not running:
+                    for username in waiting:
+                        yield username, None, f"{len(hung)} 个抓取卡住，未开始"
+                    return
+                now = time.monotonic()
+                for username in [u for u, end in running.items() if end <= now]:
+                    del running[username]
+                    hung.add(username)
+                    yield username, None, f"超过 {timeout:.0f}s"
+                continue
+            hung.discard(username)
+            if running.pop(username, None) is not None:
+                yield username, tweets, error
+    
+    def generate_report(self, accounts=None, count_per_account=2, limit=7,
+                        workers=ACCOUNT_WORKERS, timeout=ACCOUNT_TIMEOUT, rate=FETCH_RATE):
+        """
+        生成科技简报
+        
+        抓取、评分、翻译三个阶段重叠：每个账号抓完立即评分并更新当前排名，
+        当前排名里可能上榜的推文马上提交给后台翻译；抓取结束排名即确定，
+        逐条输出，每条只等自己的译文。
+        """
+        started = time.monotonic()
         if accounts is None:
-            accounts = DEFAULT_ACCOUNTS
+            accounts = list(TECH_ACCOUNTS)
         
         print("\n" + "=" * 60)
         print(f"📰 科技简报 Pro - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
         print("=" * 60)
         print(f"📊 数据源: {len(accounts)} 个博主，每博主 {count_per_account} 条")
         
-        # 获取推文
+        # 获取推文（并发，先完成的先合并）
         all_tweets = []
-        for i, username in enumerate(accounts):
-            if i >= 10:  # 限制数量避免太慢
-                break
-            desc = TECH_ACCOUNTS.get(username, {})
-            tweets = self.get_account_tweets(username, count_per_account)
+        failed = []
+        order = {username: i for i, username in enumerate(accounts)}
+        pipeline = TranslationQueue(self.translator)
+        try:
+            for username, tweets, error in self.fetch_accounts(accounts, count_per_account,
+                                                               workers, timeout, rate):
+                if error:
+                    print(f"  ✗ @{username}: {error}", flush=True)
+                    failed.append(username)
+                    continue
+                print(f"  📥 @{username}: {len(tweets)} 条", flush=True)
+                desc = TECH_ACCOUNTS.get(username, {})
+                for tweet in tweets:
+                    tweet["author"] = username
+                    tweet["author_info"] = desc
+                    tweet["value_score"] = calculate_value_score(tweet)
+                all_tweets.extend(tweets)
+                if tweets:
+                    self.speculate(pipeline, rank_tweets(all_tweets, order), limit)
+            fetched = time.monotonic() - started
+            if failed:
+                print(f"⚠️  {len(failed)} 个账号抓取失败: {', '.join(failed)}")
             
-            for tweet in tweets:
-                tweet["author"] = username
-                tweet["author_info"] = desc
-                tweet["value_score"] = calculate_value_score(tweet)
+            if not all_tweets:
+                print("\n⚠️  未获取到新内容")
+                return []
             
-            all_tweets.extend(tweets)
-            time.sleep(0.5)  # 礼貌性延迟
-        
-        if not all_tweets:
-            print("\n⚠️  未获取到新内容")
-            return []
-        
-        # 去重
-        all_tweets = deduplicate_tweets(all_tweets)
-        
-        # 按价值排序
-        all_tweets.sort(key=lambda t: t.get("value_score", 0), reverse=True)
-        
-        # 标记已读
-        for t in all_tweets:
-            if t.get("link"):
-                self.state["seen_ids"].append(t["link"])
-        self.state["seen_ids"] = self.state["seen_ids"][-500:]  # 保留最近500条
-        self.save_state()
-        
-        # 分类
-        hot_tweets = [t for t in all_tweets if t.get("value_score", 0) >= 50]
-        normal_tweets = [t for t in all_tweets if 20 <= t.get("value_score", 0) < 50]
-        
-        # 输出简报
-        print("\n" + "=" * 60)
-        
-        # 🔥 热点内容
-        if hot_tweets:
-            print("\n🔥 热点内容 (高价值):\n")
-            for i, tweet in enumerate(hot_tweets[:3], 1):
-                self._print_tweet(tweet, i, detailed=True)
-        
-        # 📝 常规内容
-        print(f"\n{'─' * 60}")
-        print(f"📝 今日精选 ({min(len(all_tweets), limit)} 条):\n")
-        
-        for i, tweet in enumerate(all_tweets[:limit], 1):
-            self._print_tweet(tweet, i, detailed=False)
-        
-        # 总结
-        print("\n" + "=" * 60)
-        print(f"✓ 共获取 {len(all_tweets)} 条推文")
-        if hot_tweets:
-            print(f"🔥 发现 {len(hot_tweets)} 条热点内容")
-        
-        return all_tweets
+            # 去重 + 按价值排序（按账号顺序排好再去重，不受完成顺序影响）
+            all_tweets = rank_tweets(all_tweets, order)
+            
+            # 标记已读
+            for t in all_tweets:
+                if t.get("link"):
+                    self.state["seen_ids"].append(t["link"])
+            self.state["seen_ids"] = self.state["seen_ids"][-500:]  # 保留最近500条
+            self.save_state()
+            
+            # 分类
+            hot_tweets = [t for t in all_tweets if t.get("value_score", 0) >= HOT_SCORE]
+            normal_tweets = [t for t in all_tweets if 20 <= t.get("value_score", 0) < HOT_SCORE]
+            
+            # 最终排名里的推文都已在抓取过程中提交翻译，这里逐条等待输出
+            self.speculate(pipeline, all_tweets, limit)
+            
+            # 输出简报
+            print("\n" + "=" * 60)
+            
+            # 🔥 热点内容
+            if hot_tweets:
+                print("\n🔥 热点内容 (高价值):\n")
+                for i, tweet in enumerate(hot_tweets[:HOT_LIMIT], 1):
+                    if tweet.get("text"):
+                        tweet["translation"] = pipeline.get(tweet["text"])
+                    self._print_tweet(tweet, i, detailed=True, pipeline=pipeline)
+            
+            # 📝 常规内容
+            print(f"\n{'─' * 60}")
+            print(f"📝 今日精选 ({min(len(all_tweets), limit)} 条):\n")
+            
+            for i, tweet in enumerate(all_tweets[:limit], 1):
+                if tweet.get("text"):
+                    tweet["translation_brief"] = pipeline.get(tweet["text"], BRIEF_CHARS)
+                self._print_tweet(tweet, i, detailed=False, pipeline=pipeline)
+            
+            # 总结
+            print("\n" + "=" * 60)
+            print(f"✓ 共获取 {len(all_tweets)} 条推文")
+            if hot_tweets:
+                print(f"🔥 发现 {len(hot_tweets)} 条热点内容")
+            stats = self.translator.cache.stats() if self.translator.cache else {}
+            if stats.get('hits') or self.translator.batches:
+                print(f"🌐 翻译: {stats.get('hits', 0)} 段命中缓存，{self.translator.translated} 段新翻译"
+                      f"（{self.translator.batches} 批，预翻译 {pipeline.submitted} 条）")
+            print(f"⏱️  用时 {time.monotonic() - started:.1f} 秒（抓取 {fetched:.1f} 秒）")
+            
+            return all_tweets
+        finally:
+            # 出错或提前返回时也要让后台翻译线程退出
+            pipeline.close()
+    
+    def speculate(self, pipeline, ranked, limit):
+        """把当前排名里会显示的推文提交翻译：热点前几条翻全文，前 limit 条翻开头"""
+        hot = [t for t in ranked if t.get("value_score", 0) >= HOT_SCORE][:HOT_LIMIT]
+        for tweet in hot:
+            if tweet.get("text"):
+                pipeline.submit(tweet["text"])
+        for tweet in ranked[:limit]:
+            if tweet.get("text"):
+                pipeline.submit(tweet["text"], BRIEF_CHARS)
     
-    def _print_tweet(self, tweet, index, detailed=False):
-        """打印单条推文"""
+    def _print_tweet(self, tweet, index, detailed=False, pipeline=None):
+        """打印单条推文（没有预先翻译的从 pipeline 取译文，翻译服务只在后台线程里用）"""
+        translate = pipeline.get if pipeline else self.translator.translate
         author = tweet.get("author", "unknown")
         author_info = tweet.get("author_info", {})
         text = tweet.get("text", "")
@@ -363,15 +438,15 @@ class TechNewsPro:
             
             if text:
                 print(f"\n   🌐 中文:")
-                translation = smart_translate(text)
+                translation = tweet.get("translation") or translate(text)
                 print(f"   {translation}")
         else:
             # 简洁模式：摘要 + 翻译
             print(f"   📝 {text[:150]}{'...' if len(text) > 150 else ''}")
             
             if text:
-                translation = smart_translate(text[:300])
-                print(f"   🌐 {translation[:150]}{'...' if len(translation) > 150 else ''}")
+                translation = tweet.get("translation_brief") or translate(text, BRIEF_CHARS)
+                print(f"   🌐 {translation[:BRIEF_CHARS]}{'...' if len(translation) > BRIEF_CHARS else ''}")
         
         print()
     
@@ -398,17 +473,24 @@ Tech News Pro - 科技资讯聚合器增强版
 
 选项:
   --accounts user1,user2  指定账号（逗号分隔）
+  --all                   抓取全部博主（默认）
+  --featured              只抓精选的 16 个博主
   --count N               每账号 N 条 (默认 2)
   --limit N               最多显示 N 条 (默认 7)
   --save                  保存到文件
   --list                  列出所有博主
   --full                  完整翻译模式
+  --translator NAME       翻译后端: google（默认）/ local（本地替身，测试用）
+  --workers N             同时抓取的账号数 (默认 4，1 为逐个抓取)
+  --timeout S             单个账号超时秒数 (默认 20)
+  --rate R                每秒最多发起 R 个账号的抓取 (默认 4)
 
 示例:
   tech_news                           # 默认简报
   tech_news --count 3 --limit 10      # 更多内容
   tech_news --full                    # 完整翻译
   tech_news --accounts karpathy,sama  # 指定博主
+  tech_news --featured --workers 1    # 只抓精选博主，逐个抓取
 """)
         sys.exit(1)
     
@@ -418,6 +500,10 @@ Tech News Pro - 科技资讯聚合器增强版
     limit = 7
     save = False
     full_mode = False
+    translator = "google"
+    workers = ACCOUNT_WORKERS
+    timeout = ACCOUNT_TIMEOUT
+    rate = FETCH_RATE
     
     i = 1
     while i < len(sys.argv):
@@ -425,6 +511,24 @@ Tech News Pro - 科技资讯聚合器增强版
         if arg == "--accounts" and i + 1 < len(sys.argv):
             accounts = [a.strip() for a in sys.argv[i + 1].split(",")]
             i += 2
+        elif arg == "--all":
+            accounts = list(TECH_ACCOUNTS)
+            i += 1
+        elif arg == "--featured":
+            accounts = list(FEATURED_ACCOUNTS)
+            i += 1
+        elif arg == "--workers" and i + 1 < len(sys.argv):
+            workers = int(sys.argv[i + 1])
+            i += 2
+        elif arg == "--timeout" and i + 1 < len(sys.argv):
+            timeout = float(sys.argv[i + 1])
+            i += 2
+        elif arg == "--rate" and i + 1 < len(sys.argv):
+            rate = float(sys.argv[i + 1])
+            if rate <= 0:
+                print("❌ --rate 必须大于 0")
+                sys.exit(1)
+            i += 2
         elif arg == "--count" and i + 1 < len(sys.argv):
             count = int(sys.argv[i + 1])
             i += 2
@@ -437,6 +541,12 @@ Tech News Pro - 科技资讯聚合器增强版
         elif arg == "--full":
             full_mode = True
             i += 1
+        elif arg == "--translator" and i + 1 < len(sys.argv):
+            translator = sys.argv[i + 1]
+            if translator not in BACKENDS:
+                print(f"❌ 未知翻译后端: {translator}（可选: {', '.join(BACKENDS)}）")
+                sys.exit(1)
+            i += 2
         elif arg == "--list":
             print("可用博主 (按优先级):\n")
             sorted_accounts = sorted(TECH_ACCOUNTS.items(), 
@@ -450,8 +560,8 @@ Tech News Pro - 科技资讯聚合器增强版
             i += 1
     
     # 生成简报
-    aggregator = TechNewsPro()
-    tweets = aggregator.generate_report(accounts, count, limit)
+    aggregator = TechNewsPro(translator)
+    tweets = aggregator.generate_report(accounts, count, limit, workers, timeout, rate)
     
     if save and tweets:
         aggregator.save_report(tweets)
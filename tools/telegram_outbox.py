@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Telegram 推送发件箱 - 持久化队列 + 异步发送
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+消息先落盘到发件箱（原子写入，崩溃不丢），再由后台进程异步投递到
+clawdbot（默认 http://localhost:3000/api/send）。
+
+用法:
+  telegram_outbox.py drain     # 投递队列中的所有消息
+  telegram_outbox.py status    # 查看队列状态
+
+环境变量:
+  CLAWDBOT_API_URL    - 投递地址（测试时可指向本地替身服务器）
+  TELEGRAM_OUTBOX_DIR - 发件箱目录
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+import http_client
+
+API_URL = os.getenv("CLAWDBOT_API_URL", "http://localhost:3000/api/send")
+OUTBOX_DIR = Path(os.getenv(
+    "TELEGRAM_OUTBOX_DIR",
+    os.path.expanduser("~/clawd-glm/cache/telegram_outbox")
+))
+
+TELEGRAM_MAX_CHARS = 4096      # Telegram 单条消息上限
+COALESCE_MAX_CHARS = 3500      # 合并小消息时的目标长度（留出余量）
+ITEM_SEPARATOR = "─" * 30 + "\n\n"
+
+SEND_RETRIES = 4               # 单次 drain 内的重试次数
+BACKOFF_BASE = 1.0             # 退避基数（秒）
+BACKOFF_MAX = 60.0
+MAX_ATTEMPTS = 20              # 累计失败超过此数移入 dead/
+DRAIN_LINGER = 300.0           # drain 等待退避到期的累计上限（秒）
+
+# ==================== 消息切分 / 合并 ====================
+
+def _hard_split(block: str, limit: int) -> List[str]:
+    """单个条目超长时，按行切分，行也超长则按字符切分"""
+    parts = []
+    current = ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            parts.append(current)
+            current = ""
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+def split_message(message: str, limit: int = TELEGRAM_MAX_CHARS,
+                  separator: str = ITEM_SEPARATOR) -> List[str]:
+    """按条目边界切分超长消息，每段不超过 limit"""
+    if len(message) <= limit:
+        return [message]
+
+    # 保留分隔符在条目末尾
+    blocks = [b + separator for b in message.split(separator)]
+    blocks[-1] = blocks[-1][:-len(separator)]
+
+    parts = []
+    current = ""
+    for block in blocks:
+        if not block:
+            continue
+        if len(block) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.extend(_hard_split(block, limit))
+        elif len(current) + len(block) > limit:
+            parts.append(current)
+            current = block
+        else:
+            current += block
+    if current:
+        parts.append(current)
+    return parts
+
+def coalesce(messages: List[str], limit: int = COALESCE_MAX_CHARS,
+             channels: Optional[List[str]] = None) -> List[List[int]]:
+    """把相邻的小消息合并成组，返回每组的下标；给了 channels 时只合并发往同一频道的消息"""
+    groups = []
+    size = 0
+    for i, msg in enumerate(messages):
+        same_channel = channels is None or (groups and channels[groups[-1][0]] == channels[i])
+        if groups and same_channel and size + len(msg) + 2 <= limit:
+            groups[-1].append(i)
+            size += len(msg) + 2
+        else:
+            groups.append([i])
+            size = len(msg)
+    return groups
+
+# ==================== 发件箱 ====================
+
+class Outbox:
+    """落盘队列：每条消息一个 JSON 文件，文件名按入队顺序排序"""
+    def __init__(self, directory: Path = OUTBOX_DIR):
+        self.dir = Path(directory)
+        self.dead_dir = self.dir / "dead"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _write_atomic(self, path: Path, entry: Dict[str, Any]):
+        """先写临时文件再 rename，避免崩溃时留下半截文件"""
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def enqueue(self, message: str, channel: str = "telegram") -> List[Path]:
+        """切分后入队，返回写入的文件"""
+        paths = []
+        for part in split_message(message):
+            entry_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+            path = self.dir / f"{entry_id}.json"
+            self._write_atomic(path, {
+                "id": entry_id,
+                "channel": channel,
+                "message": part,
+                "created_at": time.time(),
+                "attempts": 0,
+                "next_attempt_at": 0,
+                "last_error": None
+            })
+            paths.append(path)
+        return paths
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """按入队顺序列出待发送消息"""
+        entries = []
+        for path in sorted(self.dir.glob("*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entry["_path"] = path
+            entries.append(entry)
+        return entries
+
+    def ack(self, entries: List[Dict[str, Any]]):
+        """投递成功，删除文件"""
+        for entry in entries:
+            try:
+                entry["_path"].unlink()
+            except FileNotFoundError:
+                pass
+
+    def nack(self, entries: List[Dict[str, Any]], error: str, delay: float):
+        """投递失败，记录失败次数和下次尝试时间"""
+        for entry in entries:
+            path = entry.pop("_path")
+            entry["attempts"] += 1
+            entry["last_error"] = error
+            entry["next_attempt_at"] = time.time() + delay
+            if entry["attempts"] >= MAX_ATTEMPTS:
+                self.dead_dir.mkdir(exist_ok=True)
+                self._write_atomic(self.dead_dir / path.name, entry)
+                path.unlink()
+            else:
+                self._write_atomic(path, entry)
+
+    def lock(self):
+        """drain 互斥锁，同一时间只允许一个投递进程；拿不到返回 None"""
+        f = open(self.dir / ".drain.lock", "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        return f
+
+# ==================== 异步投递 ====================
+
+def backoff_delay(attempt: int) -> float:
+    """发件箱的退避间隔（比 http_client 默认的上限长）"""
+    return http_client.backoff_delay(attempt, BACKOFF_BASE, BACKOFF_MAX)
+
+def _post(api_url: str, channel: str, message: str, timeout: float) -> Tuple[Optional[str], Optional[float]]:
+    """
+    发送一条消息（共用 http_client 的连接池），返回 (错误描述, Retry-After 秒数)
+
+    成功时错误描述为 None；重试由 drain 负责，这里只发一次。
+    """
+    try:
+        response = http_client.post(
+            api_url,
+            json={"channel": channel, "message": message},
+            timeout=timeout,
+            retries=0
+        )
+    except Exception as e:
+        return str(e), None
+    if response.status_code == 200:
+        return None, None
+    return f"HTTP {response.status_code}", http_client.retry_after(response)
+
+def _due(entries: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+    """队首连续到期的消息（队首还在退避时后面的也不发，保持顺序）"""
+    due = []
+    for entry in entries:
+        if entry["next_attempt_at"] > now:
+            break
+        due.append(entry)
+    return due
+
+async def drain(outbox: Outbox, api_url: str = API_URL, retries: int = SEND_RETRIES,
+                timeout: float = 10, linger: float = DRAIN_LINGER) -> Dict[str, int]:
+    """
+    按顺序投递，直到发件箱清空
+
+    每轮重新列出队列，投递期间新入队的消息也会发出；相邻的同频道小消息合并发送。
+    队首在退避中时等到它到期再重试，累计等待超过 linger 秒就退出，留给下次 drain。
+    """
+    stats = {"sent": 0, "failed": 0, "requests": 0}
+    waited = 0.0
+    while True:
+        pending = outbox.pending()
+        if not pending:
+            break
+        entries = _due(pending, time.time())
+        if not entries:
+            wait = pending[0]["next_attempt_at"] - time.time()
+            if waited + wait > linger:
+                break
+            await asyncio.sleep(max(0.0, wait))
+            waited += max(0.0, wait)
+            continue
+
+        for group in coalesce([e["message"] for e in entries], channels=[e["channel"] for e in entries]):
+            batch = [entries[i] for i in group]
+            channel = batch[0]["channel"]
+            message = "\n\n".join(e["message"] for e in batch)
+
+            error = None
+            wait = None
+            for attempt in range(retries):
+                stats["requests"] += 1
+                error, wait = await asyncio.to_thread(_post, api_url, channel, message, timeout)
+                if error is None:
+                    break
+                if attempt < retries - 1:
+                    # 429 等响应带 Retry-After 时按它等，否则指数退避
+                    await asyncio.sleep(wait if wait is not None else backoff_delay(attempt))
+
+            if error is None:
+                outbox.ack(batch)
+                stats["sent"] += len(batch)
+            else:
+                # 保持顺序：失败后停止本轮，等它退避到期再从队首重试
+                outbox.nack(batch, error, max(wait or 0.0, backoff_delay(batch[0]["attempts"] + retries)))
+                stats["failed"] += len(batch)
+                print(f"❌ Telegram 投递失败: {error}（已保留在发件箱）")
+                break
+
+    return stats
+
+def drain_once(directory: Path = OUTBOX_DIR, api_url: str = API_URL) -> Optional[Dict[str, int]]:
+    """加锁后 drain；已有投递进程在运行时返回 None"""
+    outbox = Outbox(directory)
+    total = None
+    while True:
+        lock = outbox.lock()
+        if lock is None:
+            return total
+        try:
+            stats = asyncio.run(drain(outbox, api_url))
+        finally:
+            lock.close()
+        total = stats if total is None else {k: total[k] + v for k, v in stats.items()}
+        # 释放锁后再看一眼：刚才被锁挡在外面的投递进程已经退出，它要发的消息由这里接着发
+        if not _due(outbox.pending(), time.time()):
+            return total
+
+def spawn_drainer(directory: Path = OUTBOX_DIR):
+    """启动后台投递进程，调用方不等待"""
+    directory = Path(directory)
+    log = open(directory / "drain.log", "a")
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "drain"],
+        stdin=subprocess.DEVNULL,
+        stdout=log,
+        stderr=log,
+        start_new_session=True,
+        env={**os.environ, "TELEGRAM_OUTBOX_DIR": str(directory)}
+    )
+    log.close()
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "drain":
+        stats = drain_once()
+        if stats is None:
+            print("⏳ 已有投递进程在运行")
+        else:
+            print(f"✅ 已投递 {stats['sent']} 条（{stats['requests']} 次请求），"
+                  f"失败 {stats['failed']} 条")
+    elif command == "status":
+        outbox = Outbox()
+        entries = outbox.pending()
+        dead = list(outbox.dead_dir.glob("*.json")) if outbox.dead_dir.exists() else []
+        print(f"📮 待发送: {len(entries)} 条 | 放弃: {len(dead)} 条")
+        for e in entries:
+            print(f"  {e['id']}  {len(e['message'])} 字符  失败 {e['attempts']} 次"
+                  + (f"  ({e['last_error']})" if e["last_error"] else ""))
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+翻译缓存 - 内存 LRU + SQLite，按段缓存
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+key 是 (规范化文本哈希, 源语言, 目标语言, 翻译后端)，粒度是 translation_service 切出的段，
+同一条推文在不同简报里、完整模式和简洁模式之间都能复用已翻译的段。
+前面一层进程内 LRU，后面一层 SQLite，超出字节预算按最久未访问淘汰。
+
+用法:
+  translation_cache.py stats
+  translation_cache.py clear
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+CACHE_PATH = Path.home() / ".cache" / "tech_news" / "translations.db"
+MEMORY_ITEMS = 2048                 # 内存 LRU 条数
+MAX_BYTES = 16 * 1024 * 1024        # 磁盘上译文 + 原文的字节预算
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key         TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    target      TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    accessed    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations(accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS translations_bytes_insert AFTER INSERT ON translations BEGIN
+    UPDATE counters SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS translations_bytes_update AFTER UPDATE OF size ON translations BEGIN
+    UPDATE counters SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS translations_bytes_delete AFTER DELETE ON translations BEGIN
+    UPDATE counters SET value = value - OLD.size WHERE name = 'bytes';
+END;
+"""
+
+SPACE_RE = re.compile(r"[ \t\u00a0]+")
+
+def normalize(text: str) -> str:
+    """规范化：去掉首尾空白，合并行内连续空白（保留换行）"""
+    return SPACE_RE.sub(" ", text).strip()
+
+def cache_key(text: str, source: str, target: str, backend: str = "google") -> str:
+    content = f"{backend}|{source}|{target}|{normalize(text)}"
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+class TranslationCache:
+    """两级翻译缓存（线程安全）"""
+    def __init__(self, path: Path = CACHE_PATH, memory_items: int = MEMORY_ITEMS,
+                 max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            # 总字节数由触发器维护；第一次打开（或旧库）时按现有条目算一次
+            self.conn.execute(
+                "INSERT OR IGNORE INTO counters(name, value) "
+                "SELECT 'bytes', COALESCE(SUM(size), 0) FROM translations")
+
+    def _remember(self, key: str, translation: str):
+        self.memory[key] = translation
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, texts: Iterable[str], source: str = "auto", target: str = "zh-CN",
+                 backend: str = "google") -> Dict[str, str]:
+        """批量查询，返回 {原文: 译文}（只含命中的）"""
+        keys = {}
+        for text in texts:
+            keys.setdefault(cache_key(text, source, target, backend), []).append(text)
+        found = {}
+        with self.lock:
+            missing = []
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                else:
+                    missing.append(key)
+            if missing:
+                with self.conn:
+                    for i in range(0, len(missing), 500):
+                        batch = missing[i:i + 500]
+                        rows = self.conn.execute(
+                            f"SELECT key, translation FROM translations WHERE key IN "
+                            f"({','.join('?' * len(batch))})", batch).fetchall()
+                        for key, translation in rows:
+                            found[key] = translation
+                            self._remember(key, translation)
+                        self.conn.executemany(
+                            "UPDATE translations SET accessed = ? WHERE key = ?",
+                            [(time.time(), key) for key, _ in rows])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {text: found[key] for key, same in keys.items() if key in found for text in same}
+
+    def get(self, text: str, source: str = "auto", target: str = "zh-CN",
+            backend: str = "google") -> Optional[str]:
+        return self.get_many([text], source, target, backend).get(text)
+
+    def put_many(self, pairs: Iterable[Tuple[str, str]], source: str = "auto",
+                 target: str = "zh-CN", backend: str = "google"):
+        """批量写入 [(原文, 译文)]，超出预算时淘汰最久未访问的条目；空译文视为失败，不写入"""
+        now = time.time()
+        rows = []
+        for text, translation in pairs:
+            if not translation or not translation.strip():
+                continue
+            key = cache_key(text, source, target, backend)
+            size = len(text.encode("utf-8")) + len(translation.encode("utf-8"))
+            rows.append((key, source, target, normalize(text), translation, size, now))
+        if not rows:
+            return
+        with self.lock, self.conn:
+            for row in rows:
+                self._remember(row[0], row[4])
+            self.conn.executemany(
+                "INSERT INTO translations VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET translation = excluded.translation, "
+                "size = excluded.size, accessed = excluded.accessed", rows)
+            self._evict()
+
+    def put(self, text: str, translation: str, source: str = "auto", target: str = "zh-CN",
+            backend: str = "google"):
+        self.put_many([(text, translation)], source, target, backend)
+
+    def _total_bytes(self) -> int:
+        row = self.conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _evict(self):
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM translations ORDER BY accessed"):
+            victims.append((key,))
+            self.memory.pop(key, None)
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM translations WHERE key = ?", victims)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            size = self._total_bytes()
+            return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                    "memory": len(self.memory), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> int:
+        with self.lock, self.conn:
+            self.memory.clear()
+            return self.conn.execute("DELETE FROM translations").rowcount
+
+    def close(self):
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='翻译缓存管理')
+    parser.add_argument('--db', default=str(CACHE_PATH), help='缓存库路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='缓存统计')
+    sub.add_parser('clear', help='清空缓存')
+    args = parser.parse_args()
+
+    cache = TranslationCache(args.db)
+    if args.command == 'stats':
+        s = cache.stats()
+        print(f"🌐 翻译缓存: {args.db}")
+        print(f"   条目: {s['entries']}  占用: {s['bytes'] / 1024 / 1024:.2f} / "
+              f"{s['max_bytes'] / 1024 / 1024:.0f} MB")
+    elif args.command == 'clear':
+        print(f"✅ 已清除 {cache.clear()} 条翻译")
+    cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+翻译服务 - 分段、去重、批量并发调用，可替换翻译后端
+作者：Memory Lab Team (GLM + DeepSeek + Clawdbot)
+
+一份简报要翻译的所有文本一次交给 translate_many：
+  1. 每条文本切成段（段落 / 不超过 400 字符的句子组）
+  2. 所有段去重后先查 TranslationCache
+  3. 没命中的段按字符预算打包成批，多批并发发给后端（一批一次往返）
+  4. 译文写回缓存，再按原顺序拼回每条文本
+
+TranslationQueue 把服务放到后台线程：上游边产出边提交，排队的任务攒成批一起翻译。
+
+后端:
+  google  deep_translator.GoogleTranslator，一批段用空行拼成一次请求
+  local   本地替身，不访问网络，可模拟每批的往返延迟（测试 / 基准用）
+
+用法:
+  translation_service.py [--backend local] [--latency 0.3] [--workers 4] "text" ...
+"""
+
+import argparse
+import queue
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+sys.path.insert(0, str(Path(__file__).parent))
+from translation_cache import TranslationCache
+
+CHUNK_CHARS = 400           # 每段最多字符数（过长翻译不准确）
+BATCH_CHARS = 4500          # 每批最多字符数（Google 单次请求上限 5000）
+BATCH_ITEMS = 50
+WORKERS = 4
+QUEUE_SIZE = 256            # TranslationQueue 的队列长度
+POLL_INTERVAL = 1.0         # TranslationQueue 等待时检查后台线程是否还活着的间隔（秒）
+FAILED = "[翻译失败]"
+
+SENTENCE_RE = re.compile(r'(?<=[.!?。！？])')
+CHINESE_RE = re.compile(r'[\u4e00-\u9fff]')
+
+# ==================== 分段 ====================
+
+def needs_translation(text: str) -> bool:
+    """太短或主要是中文的文本不翻译"""
+    if not text or len(text) < 5:
+        return False
+    return len(CHINESE_RE.findall(text)) / len(text) <= 0.3
+
+def split_chunks(text: str, max_chars: int = CHUNK_CHARS) -> List[tuple]:
+    """
+    切成翻译段：按段落切，超长段落再按句子拼成不超过 max_chars 的段
+
+    返回 [(段, 后面的分隔符)]，译文按同样的分隔符拼回。
+    切分只由文本本身决定，同一段文字在不同推文 / 不同模式下切出相同的段。
+    """
+    pieces = []
+    paragraphs = [p for p in text.split('\n\n') if p.strip()]
+    for n, paragraph in enumerate(paragraphs):
+        chunks = []
+        current = ""
+        for sentence in SENTENCE_RE.split(paragraph) if len(paragraph) > max_chars else [paragraph]:
+            if current and len(current) + len(sentence) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += sentence
+        if current:
+            chunks.append(current)
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            pieces.append((chunk, '' if not last else ('\n\n' if n < len(paragraphs) - 1 else '')))
+    return pieces
+
+def leading_chunks(pieces: List[tuple], max_chars: Optional[int]) -> List[tuple]:
+    """只保留覆盖原文前 max_chars 个字符的段"""
+    if not max_chars:
+        return pieces
+    covered = 0
+    for n, (chunk, _) in enumerate(pieces):
+        covered += len(chunk)
+        if covered >= max_chars:
+            return pieces[:n + 1]
+    return pieces
+
+# ==================== 后端 ====================
+
+class TranslatorBackend(ABC):
+    """
+    翻译后端接口
+
+    translate_batch 一次往返翻译一批段，返回同样长度、同样顺序的译文列表；
+    整批失败时抛异常，单段失败时该位置返回空串或 None，服务把它们标记为翻译失败。
+    name 参与翻译缓存的 key，不同后端的译文互不混用。
+    """
+    name = "base"
+    batch_chars = BATCH_CHARS
+    batch_items = BATCH_ITEMS
+
+    @abstractmethod
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        """一次往返翻译一批段"""
+
+class GoogleBackend(TranslatorBackend):
+    """Google 翻译：一批段用空行拼成一次请求，按空行拆回；拆出的段数不对时逐段重试"""
+    name = "google"
+    SEPARATOR = "\n\n"
+
+    def __init__(self):
+        from deep_translator import GoogleTranslator
+        self.factory = GoogleTranslator
+        self.local = threading.local()
+
+    def _translator(self, source, target):
+        # GoogleTranslator 内部有可变状态，每个线程各用一个
+        key = (source, target)
+        translators = self.local.__dict__.setdefault("translators", {})
+        if key not in translators:
+            translators[key] = self.factory(source=source, target=target)
+        return translators[key]
+
+    def translate_batch(self, texts, source, target):
+        translator = self._translator(source, target)
+        if len(texts) > 1:
+            reply = translator.translate(self.SEPARATOR.join(texts)) or ""
+            parts = [p.strip() for p in reply.split(self.SEPARATOR) if p.strip()]
+            if len(parts) == len(texts):
+                return parts
+        return [translator.translate(text) for text in texts]
+
+class LocalBackend(TranslatorBackend):
+    """本地替身：译文是 "[目标语言] 原文"，每批等待 latency 秒模拟一次往返"""
+    name = "local"
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.calls = 0
+        self.chunks = 0
+        self.lock = threading.Lock()
+
+    def translate_batch(self, texts, source, target):
+        with self.lock:
+            self.calls += 1
+            self.chunks += len(texts)
+            fail = self.fail_rate and (self.calls * 0.618) % 1 < self.fail_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("injected failure")
+        return [f"[{target}] {text}" for text in texts]
+
+BACKENDS = {"google": GoogleBackend, "local": LocalBackend}
+
+def get_backend(name: str = "google", **kwargs) -> TranslatorBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"未知翻译后端: {name}（可选: {', '.join(BACKENDS)}）")
+    return BACKENDS[name](**kwargs)
+
+# ==================== 服务 ====================
+
+class TranslationService:
+    """分段 → 去重 → 查缓存 → 分批并发翻译 → 按序拼回"""
+    def __init__(self, backend: Optional[TranslatorBackend] = None,
+                 cache: Union[TranslationCache, bool] = True, workers: int = WORKERS,
+                 source: str = "auto", target: str = "zh-CN"):
+        """cache: True 用默认翻译缓存，False 不用缓存，也可以传入 TranslationCache 实例"""
+        self.backend = backend or get_backend("google")
+        self.cache = TranslationCache() if cache is True else (cache or None)
+        self.workers = max(1, workers)
+        self.source = source
+        self.target = target
+        self.batches = 0
+        self.translated = 0
+        self.failed = 0
+        self.lock = threading.Lock()     # 计数器可能被 TranslationQueue 线程和调用方同时更新
+
+    def _batches(self, chunks: List[str]) -> List[List[str]]:
+        batches, current, size = [], [], 0
+        for chunk in chunks:
+            if current and (size + len(chunk) > self.backend.batch_chars
+                            or len(current) >= self.backend.batch_items):
+                batches.append(current)
+                current, size = [], 0
+            current.append(chunk)
+            size += len(chunk)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _dispatch(self, batch: List[str]) -> Dict[str, str]:
+        try:
+            results = self.backend.translate_batch(batch, self.source, self.target)
+        except Exception as e:
+            print(f"    ✗ 翻译失败（{len(batch)} 段）: {e}", file=sys.stderr)
+            return {}
+        # 空译文算失败：不当作结果，也不写进缓存
+        return {chunk: result for chunk, result in zip(batch, results) if result and result.strip()}
+
+    def translate_chunks(self, chunks: Sequence[str]) -> Dict[str, str]:
+        """翻译一组段，返回 {段: 译文}；失败的段不在结果里"""
+        unique = list(dict.fromkeys(chunks))
+        translated = (self.cache.get_many(unique, self.source, self.target, self.backend.name)
+                      if self.cache else {})
+        missing = [chunk for chunk in unique if chunk not in translated]
+        if not missing:
+            return translated
+
+        batches = self._batches(missing)
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+            for results in pool.map(self._dispatch, batches):
+                translated.update(results)
+                if self.cache and results:
+                    self.cache.put_many(results.items(), self.source, self.target, self.backend.name)
+        done = sum(1 for chunk in missing if chunk in translated)
+        with self.lock:
+            self.batches += len(batches)
+            self.translated += done
+            self.failed += len(missing) - done
+        return translated
+
+    def translate_many(self, texts: Sequence[str],
+                       max_chars: Union[None, int, Sequence[Optional[int]]] = None) -> List[str]:
+        """
+        翻译一组文本，返回同样顺序的译文
+
+        max_chars 为整数时每条只翻译覆盖前 max_chars 个字符的段，也可以每条单独指定。
+        不需要翻译的文本原样返回，有段翻译失败的文本返回 "[翻译失败]"。
+        """
+        if max_chars is None or isinstance(max_chars, int):
+            max_chars = [max_chars] * len(texts)
+        plans = [leading_chunks(split_chunks(text), limit) if needs_translation(text) else None
+                 for text, limit in zip(texts, max_chars)]
+        translated = self.translate_chunks([chunk for plan in plans if plan for chunk, _ in plan])
+
+        results = []
+        for text, plan in zip(texts, plans):
+            if plan is None:
+                results.append(text)
+            elif all(chunk in translated for chunk, _ in plan):
+                results.append(''.join(translated[chunk] + sep for chunk, sep in plan).strip())
+            else:
+                results.append(FAILED)
+        return results
+
+    def translate(self, text: str, max_chars: Optional[int] = None) -> str:
+        return self.translate_many([text], max_chars)[0]
+
+class TranslationQueue:
+    """
+    后台翻译阶段（流水线用）
+
+    submit() 把文本放进有界队列就返回；后台线程每次把队列里攒下的任务
+    一起交给 translate_many，上一批还在翻译时新任务继续排队，自然凑成下一批。
+    get() 只等自己要的那条。队列满时 submit 会阻塞，给上游施加背压。
+    后台线程意外退出时，没有结果的任务按 FAILED 处理，调用方不会一直等下去；
+    close() 之后不再接受新任务。
+    """
+    def __init__(self, service: TranslationService, maxsize: int = QUEUE_SIZE):
+        self.service = service
+        self.jobs = queue.Queue(maxsize)
+        self.results = {}       # (文本, max_chars) -> 译文
+        self.ready = {}         # (文本, max_chars) -> Event
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, text: str, max_chars: Optional[int] = None):
+        """提交翻译任务（重复提交忽略，关闭后提交新任务抛 RuntimeError）"""
+        key = (text, max_chars)
+        with self.lock:
+            if key in self.ready:
+                return
+            if self.closed:
+                raise RuntimeError("TranslationQueue 已关闭")
+            self.ready[key] = threading.Event()
+            self.submitted += 1
+        if not self._put(key):
+            self._finish(key, FAILED)
+
+    def _put(self, item) -> bool:
+        """放进任务队列；队列满且后台线程已退出时放弃，返回 False"""
+        while self.thread.is_alive():
+            try:
+                self.jobs.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _finish(self, key, translation: str):
+        self.results[key] = translation
+        self.ready[key].set()
+
+    def _run(self):
+        while True:
+            batch = [self.jobs.get()]
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            closing = batch[-1] is None
+            batch = [key for key in batch if key is not None]
+            if batch:
+                translations = []
+                try:
+                    translations = self.service.translate_many([text for text, _ in batch],
+                                                               [limit for _, limit in batch])
+                except Exception as e:
+                    print(f"    ✗ 翻译失败: {e}", file=sys.stderr)
+                # 结果条数不够时，没对上的任务也要有结果，否则 get() 会一直等
+                for i, key in enumerate(batch):
+                    self._finish(key, translations[i] if i < len(translations) else FAILED)
+            if closing:
+                return
+
+    def get(self, text: str, max_chars: Optional[int] = None) -> str:
+        """取译文：没提交过的先提交，然后等这一条完成"""
+        key = (text, max_chars)
+        self.submit(text, max_chars)
+        ready = self.ready[key]
+        while not ready.wait(POLL_INTERVAL):
+            if not self.thread.is_alive():
+                break
+        return self.results.get(key, FAILED)
+
+    def close(self):
+        """不再接受新任务；已提交的翻译完后台线程退出（可重复调用）"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self._put(None)
+
+def main():
+    parser = argparse.ArgumentParser(description='批量翻译')
+    parser.add_argument('texts', nargs='*', help='要翻译的文本（不给则从标准输入读，空行分隔）')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='google', help='翻译后端')
+    parser.add_argument('--target', default='zh-CN', help='目标语言')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='并发批数')
+    parser.add_argument('--latency', type=float, default=0.0, help='local 后端每批延迟（秒）')
+    parser.add_argument('--no-cache', action='store_true', help='不读写翻译缓存')
+    args = parser.parse_args()
+
+    texts = args.texts or [t for t in sys.stdin.read().split('\n\n\n') if t.strip()]
+    backend = get_backend(args.backend, **({'latency': args.latency} if args.backend == 'local' else {}))
+    service = TranslationService(backend, cache=not args.no_cache,
+                                 workers=args.workers, target=args.target)
+    start = time.perf_counter()
+    for translation in service.translate_many(texts):
+        print(translation)
+        print()
+    print(f"🌐 {len(texts)} 条文本，{service.translated} 段新翻译 / {service.batches} 批，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()